@@ -4,6 +4,8 @@ import glob
 import csv
 import json
 import traceback
+from functools import lru_cache
+from threading import Lock
 
 from flask import Flask, jsonify, request
 
@@ -13,6 +15,34 @@ from historic_hebrew_dates import create_parsers
 
 app = Flask(__name__)
 
+# the editor posts its rows on (almost) every keystroke
+PARSER_CACHE_SIZE = 64
+
+# a parser keeps the state of the current parse, and the cached
+# parsers (and their dependencies) are shared between requests
+parser_lock = Lock()
+
+
+@lru_cache(maxsize=None)
+def base_parsers(lang):
+    return create_parsers(lang)
+
+
+@lru_cache(maxsize=PARSER_CACHE_SIZE)
+def cached_parser(lang, type, rows):
+    return create_parsers(lang,
+                          override_rows={type: [list(row) for row in rows]},
+                          base_parsers=base_parsers(lang))[type]
+
+
+def get_parser(lang, type, rows):
+    """
+    Gets the parser for the (edited) rows of a pattern type, only the
+    type and its dependents are compiled and only if these rows haven't
+    been used recently.
+    """
+    return cached_parser(lang, type, tuple(tuple(row) for row in rows))
+
 
 def pattern_path(lang, type):
     path = os.path.join('historic_hebrew_dates', 'patterns', f'{lang}_{type}.csv')
@@ -44,10 +74,15 @@ def put(lang, type):
     data = request.get_json()
     rows = data['rows']
 
-    with open(pattern_path(lang, type), mode='w', encoding='utf-8-sig') as patterns:
-        for row in rows:
-            patterns.write(
-                ','.join(map(lambda cell: f'"{cell}"' if ',' in cell else cell, row)) + '\n')
+    with parser_lock:
+        with open(pattern_path(lang, type), mode='w', encoding='utf-8-sig') as patterns:
+            for row in rows:
+                patterns.write(
+                    ','.join(map(lambda cell: f'"{cell}"' if ',' in cell else cell, row)) + '\n')
+
+        # the cached parsers could depend on the saved patterns
+        cached_parser.cache_clear()
+        base_parsers.cache_clear()
 
     return jsonify({'success': True})
 
@@ -57,25 +92,24 @@ def parse(lang, type):
     data = request.get_json()
     input = data['input']
     rows = data['rows']
-    parser = create_parsers(lang, override_rows={
-        type: rows
-    })[type]
     failure = False
-    try:
-        expression = parser.parse(input)
-    except Exception as error:
-        expression = str(error)
-        failure = True
-    else:
-        if expression == None:
-            evaluated = None
+    with parser_lock:
+        parser = get_parser(lang, type, rows)
+        try:
+            expression = parser.parse(input)
+        except Exception as error:
+            expression = str(error)
             failure = True
         else:
-            try:
-                evaluated = str(parser.parse(input, True))
-            except Exception as error:
-                evaluated = str(error)
+            if expression == None:
+                evaluated = None
                 failure = True
+            else:
+                try:
+                    evaluated = str(parser.parse(input, True))
+                except Exception as error:
+                    evaluated = str(error)
+                    failure = True
 
     return jsonify({'expression': expression, 'evaluated': evaluated, 'error': failure})
 
@@ -85,16 +119,15 @@ def search(lang, type):
     data = request.get_json()
     input = data['input']
     rows = data['rows']
-    parser = create_parsers(lang, override_rows={
-        type: rows
-    })[type]
     failure = False
-    try:
-        result = [escape_search(item) for item in list(parser.search(input))]
-    except Exception as error:
-        result = str(error)
-        print(traceback.format_exc())
-        failure = True
+    with parser_lock:
+        parser = get_parser(lang, type, rows)
+        try:
+            result = [escape_search(item) for item in list(parser.search(input))]
+        except Exception as error:
+            result = str(error)
+            print(traceback.format_exc())
+            failure = True
 
     return jsonify({'result': result, 'error': failure})
 
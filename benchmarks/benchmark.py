@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for constructing the parsers, tokenizing, parsing and searching.
+
+Usage:
+    python benchmarks/benchmark.py --save baseline.json
+    python benchmarks/benchmark.py --compare baseline.json
+
+When comparing, the exit code is 1 if a benchmark became slower, or used
+more memory, than the threshold allows. Differences smaller than the
+minimum deltas are ignored, these are noise.
+"""
+import csv
+import json
+import math
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from argparse import ArgumentParser
+from typing import cast, Any, Callable, Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from historic_hebrew_dates import create_parsers  # noqa: E402
+
+LANGUAGES = ['hebrew', 'dutch', 'english']
+
+# there are no test files for English
+ENGLISH_TEXTS = [
+    'the fifth of May',
+    'on the 3rd of January',
+    'in the year one thousand eight hundred and twenty',
+    'he died on the twenty first of March, eighteen hundred and five',
+    'May 5, 1820',
+    'written in June of the year nineteen hundred and twelve'
+]
+
+# words which aren't part of any pattern, to make the long input realistic
+FILLER = {
+    'hebrew': 'פה נקבר האיש הזקן',
+    'dutch': 'hier ligt begraven de oude man',
+    'english': 'here lies buried the old man'
+}
+
+# number of times the texts are repeated in the long input
+LONG_REPEAT = 5
+
+# minimum duration of a timed run in seconds, fast benchmarks are
+# run multiple times to reduce the noise
+MIN_DURATION = 0.1
+
+# fraction by which a result may be worse than the baseline
+THRESHOLD = 0.25
+
+# minimum differences with the baseline to report, smaller differences
+# are noise: seconds per operation and bytes of peak memory
+MIN_TIME_DELTA = 0.001
+MIN_PEAK_DELTA = 100000
+
+Benchmark = Callable[[], Any]
+
+
+def read_texts(lang: str) -> List[str]:
+    if lang == 'english':
+        return list(ENGLISH_TEXTS)
+
+    texts = []
+    directory = os.path.join(ROOT, 'tests')
+    for filename in sorted(os.listdir(directory)):
+        if filename.startswith(lang) and filename.endswith('.csv'):
+            with open(os.path.join(directory, filename), encoding='utf-8-sig') as rows:
+                texts += [row[0] for row in csv.reader(rows) if row]
+    return texts
+
+
+def benchmarks(lang: str) -> Dict[str, Tuple[Benchmark, int]]:
+    """Create the benchmarks for a language.
+
+    Arguments:
+        lang {str} -- Language of the patterns
+
+    Returns:
+        Dict[str, Tuple[Benchmark, int]] -- The function to run for each benchmark,
+            with the number of operations it performs
+    """
+    parser = create_parsers(lang)['dates']
+    tokenizer = parser.tokenizer
+    texts = read_texts(lang)
+    long_text = ' '.join(f'{FILLER[lang]} {text}' for text in texts * LONG_REPEAT)
+
+    return {
+        'create_parsers': (lambda: create_parsers(lang), 1),
+        'tokenize': (lambda: [list(tokenizer.tokenize(text)) for text in texts], len(texts)),
+        'parse': (lambda: [parser.parse(text) for text in texts], len(texts)),
+        'search': (lambda: [parser.search(text) for text in texts], len(texts)),
+        'parse_long': (lambda: parser.parse(long_text), 1),
+        'search_long': (lambda: parser.search(long_text), 1),
+    }
+
+
+def measure(benchmark: Benchmark, operations: int, repeat: int) -> Dict[str, float]:
+    """Time a benchmark and determine its peak memory usage.
+
+    Arguments:
+        benchmark {Benchmark} -- The function to run
+        operations {int} -- Number of operations performed by a single run
+        repeat {int} -- Number of runs, the fastest is used
+
+    Returns:
+        Dict[str, float] -- The operations per second and the peak memory in bytes
+    """
+    # warm up
+    start = time.perf_counter()
+    benchmark()
+    number = max(1, math.ceil(MIN_DURATION / (time.perf_counter() - start)))
+
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            benchmark()
+        best = min(best, (time.perf_counter() - start) / number)
+
+    # tracing slows down the run, so it isn't timed
+    tracemalloc.start()
+    benchmark()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'ops': operations / best,
+        'peak': peak
+    }
+
+
+def run(languages: List[str], repeat: int) -> Dict[str, Dict[str, float]]:
+    results = cast(Dict[str, Dict[str, float]], {})
+    for lang in languages:
+        for name, (benchmark, operations) in benchmarks(lang).items():
+            result = measure(benchmark, operations, repeat)
+            results[f'{lang}/{name}'] = result
+            print(f'{lang}/{name:<16} {result["ops"]:>12.1f} ops/s {result["peak"] / 1e6:>9.2f} MB',
+                  file=sys.stderr)
+    return results
+
+
+def compare(results: Dict[str, Dict[str, float]],
+            baseline: Dict[str, Dict[str, float]],
+            threshold: float,
+            min_time_delta: float = MIN_TIME_DELTA,
+            min_peak_delta: float = MIN_PEAK_DELTA) -> List[str]:
+    """Compare the results with a baseline.
+
+    Arguments:
+        results {Dict[str, Dict[str, float]]} -- The current results
+        baseline {Dict[str, Dict[str, float]]} -- The results to compare with
+        threshold {float} -- Fraction by which a result may be worse
+
+    Keyword Arguments:
+        min_time_delta {float} -- Seconds per operation a result may be slower
+            regardless of the threshold (default: {MIN_TIME_DELTA})
+        min_peak_delta {float} -- Bytes a result may use more regardless
+            of the threshold (default: {MIN_PEAK_DELTA})
+
+    Returns:
+        List[str] -- Description of each regression
+    """
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        expected = baseline[name]
+        if result['ops'] < expected['ops'] * (1 - threshold) and \
+                1 / result['ops'] - 1 / expected['ops'] > min_time_delta:
+            regressions.append(
+                f'{name}: {result["ops"]:.1f} ops/s, baseline {expected["ops"]:.1f} ops/s')
+        if result['peak'] > expected['peak'] * (1 + threshold) and \
+                result['peak'] - expected['peak'] > min_peak_delta:
+            regressions.append(
+                f'{name}: {result["peak"] / 1e6:.2f} MB, baseline {expected["peak"] / 1e6:.2f} MB')
+    return regressions
+
+
+def main(args=None):
+    parser = ArgumentParser(description='Benchmark the parsers.')
+    parser.add_argument('--lang', action='append', choices=LANGUAGES,
+                        help='language to benchmark, can be repeated (default: all)')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='number of timed runs, the fastest is used (default: 5)')
+    parser.add_argument('--save', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='compare the results with this JSON file')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD,
+                        help=f'fraction by which a result may be worse than the baseline (default: {THRESHOLD})')
+    parser.add_argument('--min-time-delta', type=float, default=MIN_TIME_DELTA,
+                        help=f'seconds per operation a result may be slower regardless of the threshold (default: {MIN_TIME_DELTA})')
+    parser.add_argument('--min-peak-delta', type=float, default=MIN_PEAK_DELTA,
+                        help=f'bytes of peak memory a result may use more regardless of the threshold (default: {MIN_PEAK_DELTA})')
+    options = parser.parse_args(args)
+
+    results = run(options.lang or LANGUAGES, options.repeat)
+
+    if options.save:
+        with open(options.save, 'w', encoding='utf-8') as output:
+            json.dump({
+                'python': platform.python_version(),
+                'machine': platform.machine(),
+                'results': results
+            }, output, indent=4, sort_keys=True)
+
+    if options.compare:
+        with open(options.compare, encoding='utf-8') as baseline:
+            regressions = compare(
+                results, json.load(baseline)['results'], options.threshold,
+                options.min_time_delta, options.min_peak_delta)
+        for regression in regressions:
+            print(f'Regression {regression}', file=sys.stderr)
+        if regressions:
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
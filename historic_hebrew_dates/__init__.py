@@ -1,4 +1,6 @@
 #!/usr/bin/env python3
 from .pattern_factory import create_parsers
+from .parser_cache import load_parsers
 from .chart_parser import ChartParser
 from .pattern_matcher import PatternMatcher
+from .batch import SearchPool, search_many
@@ -1,11 +1,25 @@
 #!/usr/bin/env python3
+import csv
+import io
+import json
+import math
+import os
 import sys
 import re
-from .annotated_corpus import AnnotatedCorpus
-from .pattern_factory import create_parsers
+import time
+from argparse import ArgumentParser
+from itertools import islice
+from typing import Any, Dict, IO, Iterator, List, Optional, Tuple
 
+from .parser_cache import load_parsers
 
-def NumeralParser(): return create_parsers('hebrew')['numerals']
+FORMATS = ['lines', 'csv', 'jsonl']
+
+# (source, line number, text)
+Text = Tuple[str, int, str]
+
+
+def NumeralParser(): return load_parsers('hebrew')['numerals']
 
 
 def main(args=None):
@@ -15,6 +29,10 @@ def main(args=None):
     if args is None:
         args = sys.argv[1:]
 
+    if args and args[0] == 'batch':
+        batch(args[1:])
+        return
+
     text = ' '.join(args)
     if text:
         if text == 'initial_patterns':
@@ -29,9 +47,185 @@ def main(args=None):
 
 
 def initial_patterns():
+    # the corpus requires pandas and bidi, only load these when needed
+    from .annotated_corpus import AnnotatedCorpus
     c = AnnotatedCorpus()
     print(c.write_patterns())
 
 
+def batch_arguments() -> ArgumentParser:
+    parser = ArgumentParser(
+        prog='historic_hebrew_dates batch',
+        description='Search the texts of a corpus, the results are written to stdout as JSON lines.')
+    parser.add_argument('files', nargs='*', default=['-'],
+                        help='files to read, - for stdin (default: stdin)')
+    parser.add_argument('--lang', default='hebrew',
+                        help='language of the patterns (default: hebrew)')
+    parser.add_argument('--type', default='dates',
+                        help='pattern type to search for (default: dates)')
+    parser.add_argument('--format', choices=FORMATS,
+                        help='input format, by default determined by the file extension: csv, jsonl or else lines')
+    parser.add_argument('--column',
+                        help='CSV column (index or header name) or JSONL field containing the text (default: 0 or text)')
+    parser.add_argument('--workers', type=int,
+                        help='number of worker processes, 1 searches in this process (default: number of CPUs)')
+    parser.add_argument('--chunksize', type=int, default=16,
+                        help='number of texts to send to a worker at once (default: 16)')
+    parser.add_argument('--encoding', default='utf-8',
+                        help='encoding of the input files and stdin (default: utf-8)')
+    return parser
+
+
+def batch(args: List[str]):
+    """Search the texts of a corpus in parallel, writing the results in order.
+
+    Arguments:
+        args {List[str]} -- Command line arguments
+    """
+    from .batch import SearchPool
+
+    options = batch_arguments().parse_args(args)
+    texts = read_texts(options.files, options.format,
+                       options.column, options.encoding)
+
+    count = 0
+    characters = 0
+    matches = 0
+    start = time.perf_counter()
+    with SearchPool(options.lang, options.type, options.workers) as pool:
+        # limit the number of texts which are read ahead
+        size = options.chunksize * (options.workers or os.cpu_count() or 1) * 4
+        while True:
+            chunk = list(islice(texts, size))
+            if not chunk:
+                break
+            for (source, line, text), result in zip(chunk, pool.imap((text for _, _, text in chunk), options.chunksize)):
+                record = format_result(source, line, text, result)
+                print(json.dumps(json_value(record), ensure_ascii=False,
+                                 allow_nan=False, default=str))
+                count += 1
+                characters += len(text)
+                matches += len(record['matches'])
+        pool.close()
+    duration = time.perf_counter() - start
+
+    print(f'{count} texts, {characters} characters, {matches} matches in {duration:.2f}s: '
+          f'{count / duration:.1f} texts/s, {characters / duration:.0f} characters/s',
+          file=sys.stderr)
+
+
+def read_texts(files: List[str], format: Optional[str], column: Optional[str], encoding: str = 'utf-8') -> Iterator[Text]:
+    """Read the texts to search.
+
+    Arguments:
+        files {List[str]} -- Paths of the files, - for stdin
+        format {Optional[str]} -- lines, csv or jsonl; None to determine it by the extension
+        column {Optional[str]} -- CSV column (index or header name) or JSONL field
+
+    Keyword Arguments:
+        encoding {str} -- Encoding of the files (default: {'utf-8'})
+
+    Yields:
+        Iterator[Text] -- The source, line number and text
+    """
+    for filename in files:
+        file_format = format or detect_format(filename)
+        if filename == '-':
+            stdin: IO[str] = sys.stdin
+            if hasattr(sys.stdin, 'buffer'):
+                stdin = io.TextIOWrapper(
+                    sys.stdin.buffer, encoding=encoding, newline='')
+            yield from read_file('-', stdin, file_format, column)
+        else:
+            with open(filename, encoding=encoding, newline='') as stream:
+                yield from read_file(filename, stream, file_format, column)
+
+
+def detect_format(filename: str) -> str:
+    extension = os.path.splitext(filename)[1].lower()
+    if extension == '.csv':
+        return 'csv'
+    elif extension in ['.jsonl', '.ndjson']:
+        return 'jsonl'
+    return 'lines'
+
+
+def read_file(source: str, stream: IO[str], format: str, column: Optional[str]) -> Iterator[Text]:
+    if format == 'csv':
+        reader = csv.reader(stream)
+        if column is None or column.isdigit():
+            index = int(column or 0)
+        else:
+            # the column is named in the header
+            try:
+                index = next(reader).index(column)
+            except (StopIteration, ValueError):
+                raise ValueError(f'Unknown column {column} in {source}')
+        for row in reader:
+            if len(row) > index:
+                yield source, reader.line_num, row[index]
+    elif format == 'jsonl':
+        field = column or 'text'
+        for line_number, line in enumerate(stream, 1):
+            if not line.strip():
+                continue
+            # skip an invalid record instead of stopping the entire batch
+            try:
+                record = json.loads(line)
+            except ValueError as error:
+                print(f'{source}:{line_number}: skipped, invalid JSON: {error}',
+                      file=sys.stderr)
+                continue
+            text = record.get(field) if isinstance(record, dict) else None
+            if not isinstance(text, str):
+                print(f'{source}:{line_number}: skipped, no text in the {field} field',
+                      file=sys.stderr)
+                continue
+            yield source, line_number, text
+    else:
+        for line_number, line in enumerate(stream, 1):
+            yield source, line_number, line.rstrip('\r\n')
+
+
+def format_result(source: str, line: int, text: str, result: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Describe the matches found in a text.
+
+    Arguments:
+        source {str} -- File containing the text
+        line {int} -- Line number of the text in the file
+        text {str} -- The searched text
+        result {List[Dict[str, Any]]} -- The result of searching the text
+
+    Returns:
+        Dict[str, Any] -- The text and the matches, with their character offsets
+    """
+    return {
+        'source': source,
+        'line': line,
+        'text': text,
+        'matches': [{
+            'start': match['start'],
+            'end': match['end'],
+            'text': text[match['start']:match['end']],
+            'type': match['type'],
+            'parsed': match['parsed'],
+            'eval': match['eval']
+        } for part in result for match in part.get('matches', [])]
+    }
+
+
+def json_value(value: Any) -> Any:
+    """Replace the values which aren't valid JSON: a numeral which
+    couldn't be evaluated is NaN, this becomes null.
+    """
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    elif isinstance(value, dict):
+        return {key: json_value(item) for key, item in value.items()}
+    elif isinstance(value, (list, tuple)):
+        return [json_value(item) for item in value]
+    return value
+
+
 if __name__ == "__main__":
     main()
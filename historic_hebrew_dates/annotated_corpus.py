@@ -6,18 +6,23 @@ import csv
 import pandas as pd
 from bidi.algorithm import get_display
 
+from functools import lru_cache
+
 from .grammars.annotation_grammar import get_patterns
 from .pattern_factory import create_parsers
 
-parsers = create_parsers('hebrew')
+
+@lru_cache(maxsize=None)
+def hebrew_parsers():
+    return create_parsers('hebrew')
 
 
 def DateTypeParser():
-    return parsers['date_types']
+    return hebrew_parsers()['date_types']
 
 
 def NumeralParser():
-    return parsers['numerals']
+    return hebrew_parsers()['numerals']
 
 
 pd.set_option('display.max_colwidth', -1)
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+from typing import cast, Any, Dict, Iterable, Iterator, List, Optional
+
+from .parser_cache import load_parsers
+from .pattern_parser import PatternParser
+
+# the parser of a worker process, every process has its own
+# because a parser keeps the state of the current parse
+worker_parser = cast(Optional[PatternParser], None)
+
+
+def init_worker(lang: str, type: str, override_rows: Dict[str, List[str]]):
+    global worker_parser
+    worker_parser = load_parsers(lang, override_rows)[type]
+
+
+def search_worker(text: str) -> List[Dict[str, Any]]:
+    return cast(List[Dict[str, Any]], cast(PatternParser, worker_parser).search(text))
+
+
+class SearchPool:
+    def __init__(self, lang: str, type: str, workers: int = None, override_rows: Dict[str, List[str]] = {}):
+        """Start worker processes for searching texts, the parsers
+        are created once for each worker (or loaded from the cache).
+
+        Arguments:
+            lang {str} -- Language of the patterns
+            type {str} -- Name of the pattern type to search for
+
+        Keyword Arguments:
+            workers {int} -- Number of processes, defaults to the number of CPUs.
+                Using 1 runs the searches in the current process. (default: {None})
+            override_rows {Dict[str, List[str]]} -- Patterns to use instead of the
+                pattern files (default: {{}})
+        """
+        if workers == 1:
+            self.pool = None
+            self.parser = load_parsers(lang, override_rows)[type]
+        else:
+            from multiprocessing import Pool
+            self.pool = Pool(workers, init_worker, (lang, type, override_rows))
+
+    def imap(self, texts: Iterable[str], chunksize: int = 16) -> Iterator[List[Dict[str, Any]]]:
+        """Search the texts, the results are yielded in the order of the input.
+
+        Arguments:
+            texts {Iterable[str]} -- Texts to search
+
+        Keyword Arguments:
+            chunksize {int} -- Number of texts to send to a worker at once (default: {16})
+
+        Returns:
+            Iterator[List[Dict[str, Any]]] -- The search result of each text
+        """
+        if self.pool is None:
+            return map(self.parser.search, texts)
+        return self.pool.imap(search_worker, texts, chunksize)
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        if self.pool is not None:
+            self.pool.terminate()
+
+
+def search_many(texts: Iterable[str], lang: str, type: str, workers: int = None, chunksize: int = 16) -> List[List[Dict[str, Any]]]:
+    """Search many texts in parallel.
+
+    Arguments:
+        texts {Iterable[str]} -- Texts to search
+        lang {str} -- Language of the patterns
+        type {str} -- Name of the pattern type to search for
+
+    Keyword Arguments:
+        workers {int} -- Number of processes, defaults to the number of CPUs (default: {None})
+        chunksize {int} -- Number of texts to send to a worker at once (default: {16})
+
+    Returns:
+        List[List[Dict[str, Any]]] -- The search result of each text, in the order of the input
+    """
+    with SearchPool(lang, type, workers) as pool:
+        return list(pool.imap(texts, chunksize))
@@ -1,18 +1,103 @@
-from typing import cast, List, Dict, Tuple, Set, TypeVar
+from typing import cast, List, Dict, Iterator, Tuple, Set, TypeVar
 from functools import reduce
-from itertools import chain
 from .pattern_matcher import PatternMatcher
 from .tokenizer import FragmentedToken
-from historic_hebrew_dates.pattern_matcher import PatternMatcherState, TokenSpan
+from historic_hebrew_dates.pattern_matcher import BackrefPart, PartKey, PatternMatcherState, PatternNode, TokenPart, TokenSpan, token_key
+
+# states waiting for a part, by the key of that part
+KeyedStates = Dict[PartKey, List[PatternMatcherState]]
 
 T = TypeVar('T', bound='ChartParser')
 
 
 class ChartParser:
-    def __init__(self: T, agenda: List[PatternMatcher]):
+    def __init__(self: T, agenda: List[PatternMatcher], compiled=True):
+        """Create a chart parser for matching patterns.
+
+        Arguments:
+            agenda {List[PatternMatcher]} -- Matchers in the order they should be applied,
+                a matcher can use the matches of all the preceding matchers.
+
+        Keyword Arguments:
+            compiled {bool} -- Merge the matchers of the same type into a trie, this
+                way patterns sharing their first parts match these only once (default: {True})
+        """
+        self.compiled = compiled
+        self.set_agenda(agenda)
+
+    def set_agenda(self, agenda: List[PatternMatcher]):
+        """Replace the matchers of this parser.
+
+        Arguments:
+            agenda {List[PatternMatcher]} -- Matchers in the order they should be applied
+        """
         self.agenda = agenda
+        self.__compile_agenda()
         self.reset()
 
+    def __compile_agenda(self):
+        """Compile the matchers on the agenda to tries and index them by the
+        first part of their pattern. This way a token position only needs to
+        start the tries which could actually begin there.
+        """
+        groups = cast(List[List[PatternMatcher]], [])
+        # texts of the single token matches of the last group
+        texts = cast(Set[str], set())
+        any_text = False
+        for matcher in self.agenda:
+            if self.compiled and groups and groups[-1][0].type == matcher.type \
+                    and not self.__depends_on(matcher, texts, any_text):
+                groups[-1].append(matcher)
+            else:
+                groups.append([matcher])
+                texts = set()
+                any_text = False
+
+            if len(matcher.parts) == 1:
+                part = matcher.parts[0]
+                if isinstance(part, TokenPart):
+                    texts.add(part.text)
+                else:
+                    any_text = True
+
+        self.groups = groups
+        # position of each matcher on the agenda
+        self.ranks = cast(Dict[PatternMatcher, int], {
+            matcher: index for index, matcher in enumerate(self.agenda)})
+
+        # the root nodes of the tries are processed in order
+        self.tries = cast(List[PatternNode], [])
+        # part key -> agenda indexes
+        self.first_parts = cast(Dict[PartKey, Set[int]], {})
+
+        for agenda_index, group in enumerate(groups):
+            root = PatternNode()
+            for matcher in group:
+                root.add(matcher)
+            self.tries.append(root)
+            for key in root.children.keys():
+                self.first_parts.setdefault(key, set()).add(agenda_index)
+
+    def __depends_on(self, matcher: PatternMatcher, texts: Set[str], any_text: bool) -> bool:
+        """Whether the matcher could use the matches of the preceding
+        matchers of its own type. It then cannot be merged with those.
+
+        Arguments:
+            matcher {PatternMatcher} -- The matcher to check
+            texts {Set[str]} -- Texts of the single token matches of the preceding matchers
+            any_text {bool} -- Whether the preceding matchers could match any single token
+        """
+        for part in matcher.parts:
+            if isinstance(part, BackrefPart):
+                return True
+            elif isinstance(part, TokenPart):
+                # a token could also match a typed span with the same text
+                if any_text or part.text in texts:
+                    return True
+            elif part.type == matcher.type:
+                return True
+        return False
+
     def dictionary(self) -> Set[str]:
         """Retrieves all the tokens which can be matched by the parser.
 
@@ -31,10 +116,11 @@ class ChartParser:
         # everything starts at zero
         self.agenda_index = 0
         self.token_indexes = cast(Dict[int, int], {})
-        for i in range(0, len(self.agenda)):
+        for i in range(0, len(self.tries)):
             self.token_indexes[i] = 0
 
-        self.states = cast(List[PatternMatcherState], [])
+        # states by their agenda index and (last inclusive) token position
+        self.states = cast(Dict[Tuple[int, int], KeyedStates], {})
         self.tokens = cast(List[FragmentedToken], [])
 
         # matches at the token start positions containing
@@ -42,11 +128,22 @@ class ChartParser:
         # position information for potential sub tokens)
         self.matches = cast(List[List[TokenSpan]], [])
 
+        # the same matches by their (sub) token start position
+        self.match_index = cast(
+            Dict[Tuple[int, int, int], List[TokenSpan]], {})
+
+        # agenda indexes of the matchers which could start at a token
+        # position, only the positions where any could are listed
+        self.seeds = cast(Dict[int, Set[int]], {})
+
     def input(self, tokens: List[FragmentedToken]):
         # start at the lowest agenda again
         self.agenda_index = 0
-        for token in tokens:
+        for token_index, token in enumerate(tokens, len(self.tokens)):
             self.tokens.append(token)
+            for interpretation in token.interpretations:
+                for subtoken in interpretation:
+                    self.__seed(token_index, token_key(subtoken))
 
     def add_child_matches(self, type: str, matches: List[List[TokenSpan]]):
         while len(self.matches) <= len(matches):
@@ -54,7 +151,30 @@ class ChartParser:
 
         for index in range(0, len(matches)):
             for match in matches[index]:
-                self.matches[index].append(match.clone(type, True))
+                self.__add_match(match.clone(type, True))
+
+    def __add_match(self, match: TokenSpan):
+        # the matchers of a trie are applied together: place their matches
+        # in order of the agenda, as if each matcher was applied in turn
+        # (the matches of the child patterns come first)
+        rank = self.ranks.get(match.matcher, -1)
+        self.__insert(self.matches[match.start], match, rank)
+        self.__insert(self.match_index.setdefault(
+            (match.start, match.interpretation_index, match.subtoken_index), []), match, rank)
+
+        for key in match.part_keys():
+            self.__seed(match.start, key)
+
+    def __seed(self, token_index: int, key: PartKey):
+        agenda_indexes = self.first_parts.get(key)
+        if agenda_indexes:
+            self.seeds.setdefault(token_index, set()).update(agenda_indexes)
+
+    def __insert(self, matches: List[TokenSpan], match: TokenSpan, rank: int):
+        index = len(matches)
+        while index > 0 and self.ranks.get(matches[index - 1].matcher, -1) > rank:
+            index -= 1
+        matches.insert(index, match)
 
     def iterate(self) -> bool:
         """Moves the current matcher one step forward, or shift to the
@@ -64,37 +184,122 @@ class ChartParser:
             bool -- Whether more parsing could be done on the data set
         """
 
-        matcher = self.agenda[self.agenda_index]
-        token_index = self.token_indexes[self.agenda_index]
+        self.__step(self.agenda_index, self.token_indexes[self.agenda_index])
+
+        has_more = False
+
+        if self.token_indexes[self.agenda_index] < len(self.tokens):
+            has_more = True
+        else:
+            # try the next matcher on the agenda
+            self.agenda_index += 1
+            if self.agenda_index < len(self.tries):
+                has_more = True
+
+        if not has_more:
+            return False
+        return has_more
+
+    def schedule(self) -> Iterator[int]:
+        """Moves all the matchers forward one token position at a time.
+        At each position the matchers are moved in the order of the agenda,
+        each as far as the matches it could use from the preceding matchers
+        are complete. This gives the same matches as iterating each matcher
+        over all the tokens in turn.
+
+        Yields:
+            Iterator[int] -- After each position: the number of leading tokens
+                for which all the matches starting there are complete
+        """
+        reaches = self.__reaches()
+        count = len(self.tokens)
+        for frontier in range(1, count + 1):
+            bound = frontier
+            for agenda_index, reach in enumerate(reaches):
+                while self.token_indexes[agenda_index] < bound:
+                    self.__step(agenda_index, self.token_indexes[agenda_index])
+                if self.token_indexes[agenda_index] < count:
+                    # the following matchers can only use the positions where
+                    # this matcher can't start any more matches
+                    bound = min(
+                        bound, max(0, self.token_indexes[agenda_index] - reach + 1))
+            yield bound
+        self.agenda_index = len(self.tries)
+
+    def __reaches(self) -> List[int]:
+        """Determines the maximum number of tokens spanned by the matches
+        of each matcher on the agenda.
+
+        Returns:
+            List[int] -- The number of tokens, at least one, for each agenda index
+        """
+        # type -> maximum number of tokens
+        spans = cast(Dict[str, int], {})
+        for matches in self.matches:
+            for match in matches:
+                spans[match.type] = max(
+                    spans.get(match.type, 0), match.last - match.start + 1)
+
+        reaches = cast(List[int], [])
+        for group in self.groups:
+            reach = 1
+            for matcher in group:
+                length = 0
+                for part in matcher.parts:
+                    if isinstance(part, TokenPart):
+                        length += 1
+                    elif isinstance(part, BackrefPart):
+                        length += max(spans.values(), default=1)
+                    else:
+                        length += spans.get(part.type, 1)
+                reach = max(reach, length)
+            type = group[0].type
+            spans[type] = max(spans.get(type, 0), reach)
+            reaches.append(reach)
+
+        return reaches
+
+    def __step(self, agenda_index: int, token_index: int):
+        """Moves a matcher forward over a token.
+
+        Arguments:
+            agenda_index {int} -- The matcher to move
+            token_index {int} -- The token to process, the matcher
+                should have processed all the preceding tokens
+        """
+        trie = self.tries[agenda_index]
 
         while len(self.matches) <= token_index:
             self.matches.append([])
 
-        updated_states = cast(List[PatternMatcherState], [])
-        new_matches = cast(List[TokenSpan], [])
+        # (no casts: this is the inner loop of the parser)
+        new_matches = []  # type: List[TokenSpan]
 
-        # insert a new state to check whether a pattern starts from this
-        # (sub) token index
-        check_states = list(chain(
-            filter(lambda state: state.matcher == matcher and state.position + 1 == token_index,
-                   self.states),
-            [PatternMatcherState(matcher)]))
+        # states which could continue from the preceding token
+        check_states = self.states.pop(
+            (agenda_index, token_index - 1), {})
+        # only start the pattern if its first part could match here
+        if agenda_index in self.seeds.get(token_index, ()):
+            self.__add_state(check_states, PatternMatcherState(trie))
 
         # tests all states for this agenda
-        interpretations = self.tokens[token_index].interpretations
+        interpretations = self.tokens[token_index].interpretations if check_states else []
+        # states created by this step by their position, in order of creation
+        created = {}  # type: Dict[int, List[PatternMatcherState]]
         for interpretation_index, interpretation in enumerate(interpretations):
-            token_states = cast(List[PatternMatcherState], [])
+            token_states = {}  # type: KeyedStates
             # an ambiguous token could be resolved to multiple realizations
             for subtoken_index, subtoken in enumerate(interpretation):
                 self.__place_matches(
                     token_index,
                     interpretation_index,
                     subtoken_index,
-                    check_states + token_states,
+                    check_states,
                     token_states,
+                    created,
                     new_matches)
 
-                self.__place_span(check_states + token_states, TokenSpan(
+                self.__place_span(check_states, token_states, TokenSpan(
                     token_index,
                     interpretation_index,
                     len(interpretation),
@@ -104,91 +309,96 @@ class ChartParser:
                     len(interpretation),
                     subtoken_index,
                     None,
-                    [subtoken]), token_states, new_matches)
-            updated_states += token_states
-
-        for state in self.states:
-            # retain states for other agendas
-            # and for those which are beyond this token
-            if state.matcher != matcher or state.position >= token_index:
-                updated_states.append(state)
-                continue
-
-        self.states = updated_states
+                    (subtoken,)), created, new_matches)
+
+        # retain the states for continuing beyond this token: the states
+        # of the latest step are offered first
+        for position, states in created.items():
+            key = (agenda_index, position)
+            retained = {}  # type: KeyedStates
+            for state in states:
+                self.__add_state(retained, state)
+            for part_key, waiting in self.states.pop(key, {}).items():
+                retained.setdefault(part_key, []).extend(waiting)
+            self.states[key] = retained
 
         for match in new_matches:
-            self.matches[match.start].append(match)
-
-        has_more = False
-
-        # move the current agenda forward
-        self.token_indexes[self.agenda_index] += 1
-        if self.token_indexes[self.agenda_index] < len(self.tokens):
-            has_more = True
-        else:
-            # try the next matcher on the agenda
-            self.agenda_index += 1
-            if self.agenda_index < len(self.agenda):
-                has_more = True
+            self.__add_match(match)
 
-        if not has_more:
-            return False
-        return has_more
+        self.token_indexes[agenda_index] += 1
 
     def process_all(self):
-        while self.iterate():
+        for _ in self.schedule():
             pass
+        # only needed while parsing
+        self.seeds = {}
+        self.match_index = {}
+
+    def __add_state(self, states: KeyedStates, state: PatternMatcherState):
+        for key in state.expected:
+            states.setdefault(key, []).append(state)
 
     def __place_matches(self,
                         token_index: int,
                         interpretation_index: int,
                         subtoken_index: int,
-                        states: List[PatternMatcherState],
-                        updated_states: List[PatternMatcherState],
+                        check_states: KeyedStates,
+                        token_states: KeyedStates,
+                        created: Dict[int, List[PatternMatcherState]],
                         new_matches: List[TokenSpan]):
         """
         Attempt to continue the states using the existing
         matches on this position.
         """
 
-        for span in self.matches[token_index]:
-            if span.interpretation_index == interpretation_index and \
-                    span.subtoken_index == subtoken_index:
-                # could the pattern continue using an existing match on this (sub)token?
-                self.__place_span(
-                    states,
-                    span,
-                    updated_states,
-                    new_matches)
+        spans = self.match_index.get(
+            (token_index, interpretation_index, subtoken_index))
+        if not spans:
+            return
 
-    def __place_span(self,
-                     states: List[PatternMatcherState],
-                     span: TokenSpan,
-                     updated_states: List[PatternMatcherState],
-                     new_matches: List[TokenSpan]):
-        for state in states:
-            is_match, is_backref = state.test(span)
-            if is_match:
-                if is_backref:
-                    # backref continues on all existing matches on this position
-                    for match in list(new_matches):
-                        self.__state_next(
-                            state, match, updated_states, new_matches)
-                else:
-                    self.__state_next(
-                        state, span, updated_states, new_matches)
+        # could the pattern continue using an existing match on this (sub)token?
+        # The matches are offered in order, each to the states in order of
+        # creation: the first of equal matches hides the others.
+        candidates = [(state, span, key)
+                      for span in spans
+                      for key in span.part_keys()
+                      for keyed_states in (check_states, token_states)
+                      for state in keyed_states.get(key, [])]
 
-    def __state_next(self,
-                     state: PatternMatcherState,
+        for state, span, key in candidates:
+            self.__continue(state, span, key, token_states, created, new_matches)
+
+    def __place_span(self,
+                     check_states: KeyedStates,
+                     token_states: KeyedStates,
                      span: TokenSpan,
-                     updated_states: List[PatternMatcherState],
+                     created: Dict[int, List[PatternMatcherState]],
                      new_matches: List[TokenSpan]):
-        next_state = state.clone()
-        if next_state.next(span):
-            # complete!
-            new_matches.append(next_state.emit())
-        else:
-            updated_states.append(next_state)
+        # only offer the span to the states expecting it
+        candidates = [(state, key)
+                      for key in span.part_keys()
+                      for keyed_states in (check_states, token_states)
+                      for state in keyed_states.get(key, [])]
+
+        for state, key in candidates:
+            self.__continue(state, span, key, token_states, created, new_matches)
+
+    def __continue(self,
+                   state: PatternMatcherState,
+                   span: TokenSpan,
+                   key: PartKey,
+                   token_states: KeyedStates,
+                   created: Dict[int, List[PatternMatcherState]],
+                   new_matches: List[TokenSpan]):
+        if not state.test(span):
+            return
+
+        for next_state in state.next(span, key):
+            if next_state.is_complete:
+                # complete!
+                new_matches += next_state.emit()
+            self.__add_state(token_states, next_state)
+            created.setdefault(next_state.position, []).append(next_state)
 
     def __str__(self):
         def format_token_matches(matches: List[TokenSpan]):
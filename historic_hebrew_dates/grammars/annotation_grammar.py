@@ -1,5 +1,6 @@
 import re
-from typing import Dict, List, Union
+from functools import lru_cache
+from typing import Any, Dict, List, Union, Tuple
 
 tokens = (
     'WORD',
@@ -20,10 +21,6 @@ t_ignore = "\r[]><,?/:'"
 def t_error(t):
     raise Exception("Illegal character '%s'" % t.value[0])
 
-# Build the lexer
-import ply.lex as lex
-lexer = lex.lex(reflags=re.UNICODE)
-
 def p_expression(p):
     '''expression : words
                   | annotation
@@ -54,8 +51,20 @@ def p_words(p):
 def p_error(p):
     raise Exception("Syntax error at '%s'" % p.value)
 
-import ply.yacc as yacc
-parser = yacc.yacc(tabmodule='annotation_parsetab', debugfile='annotation.out')
+@lru_cache(maxsize=None)
+def get_parser() -> Tuple[Any, Any]:
+    """Build the lexer and parser on first use. The parser uses the
+    prebuilt tables in annotation_parsetab.py, nothing is written to disk.
+
+    Returns:
+        Tuple[Any, Any] -- The lexer and the parser
+    """
+    import ply.lex as lex
+    import ply.yacc as yacc
+
+    lexer = lex.lex(reflags=re.UNICODE)
+    parser = yacc.yacc(tabmodule='annotation_parsetab', write_tables=False, debug=False)
+    return lexer, parser
 
 def word_to_pattern(word: str):
     word = re.sub(r'[ \t\n]+', ' ', word)
@@ -105,6 +114,7 @@ def get_patterns(text: str, tag_types: Dict[str, str] = {}):
     tag_types: Tag types which should be mapped to another type (e.g. year -> number)
     """
 
+    lexer, parser = get_parser()
     parse = parser.parse(text, lexer=lexer)
     return get_patterns_from_parse(parse, tag_types)
 
@@ -117,7 +127,8 @@ if __name__ == "__main__":
                 quit()
         except EOFError:
             break
-        parse = parser.parse(s)
+        lexer, parser = get_parser()
+        parse = parser.parse(s, lexer=lexer)
         print(parse)
         patterns = get_patterns(s)
         print(patterns)
@@ -1,6 +1,7 @@
 import re
 import uuid
-from typing import Dict, List, Union, Pattern, Tuple
+from functools import lru_cache
+from typing import Any, Dict, List, Union, Pattern, Tuple
 
 tokens = (
     'LBRACE',
@@ -23,11 +24,6 @@ def t_error(t):
     raise Exception("Illegal character '%s'" % t.value[0])
 
 
-# Build the lexer
-import ply.lex as lex
-lexer = lex.lex(reflags=re.UNICODE)
-
-
 def p_pattern(p):
     '''pattern : words
                | sub
@@ -91,12 +87,25 @@ def p_error(p):
                     (p.value, p.lexpos, p.type))
 
 
-import ply.yacc as yacc
-parser = yacc.yacc(tabmodule='pattern_parsetab', debugfile='pattern.out')
+@lru_cache(maxsize=None)
+def get_parser() -> Tuple[Any, Any]:
+    """Build the lexer and parser on first use. The parser uses the
+    prebuilt tables in pattern_parsetab.py, nothing is written to disk.
+
+    Returns:
+        Tuple[Any, Any] -- The lexer and the parser
+    """
+    import ply.lex as lex
+    import ply.yacc as yacc
+
+    lexer = lex.lex(reflags=re.UNICODE)
+    parser = yacc.yacc(tabmodule='pattern_parsetab', write_tables=False, debug=False)
+    return lexer, parser
 
 
 def get_parts(pattern: str) -> List[Dict[str, str]]:
     try:
+        lexer, parser = get_parser()
         return parser.parse(pattern, lexer=lexer)
     except Exception as error:
         raise Exception("Could not parse %s" % pattern)
@@ -120,5 +129,6 @@ if __name__ == "__main__":
         except ValueError:
             name = None
             pattern = s
-        parts = parser.parse(pattern)
+        lexer, parser = get_parser()
+        parts = parser.parse(pattern, lexer=lexer)
         print(parts)
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+import glob
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+from typing import cast, Dict, List, Optional
+
+from .pattern_factory import create_parsers, patterns_path, read_specification
+from .pattern_parser import PatternParser
+
+# directory of the cached parsers, when this environment variable
+# is set to an empty string caching is disabled
+CACHE_VARIABLE = 'HISTORIC_HEBREW_DATES_CACHE'
+
+PACKAGE_PATH = os.path.dirname(__file__)
+
+
+def cache_directory() -> Optional[str]:
+    directory = os.environ.get(CACHE_VARIABLE)
+    if directory is None:
+        return os.path.join(os.path.expanduser('~'), '.cache', 'historic_hebrew_dates')
+    return directory or None
+
+
+def cache_key(lang: str, override_rows: Dict[str, List[str]] = {}, compiled=True) -> str:
+    """Get a hash of everything the parsers of a language are compiled from:
+    the sources (see `source_key`) followed by the variant of the parsers
+    created from them, the overridden rows and whether they are compiled.
+
+    Arguments:
+        lang {str} -- Language of the patterns
+
+    Keyword Arguments:
+        override_rows {Dict[str, List[str]]} -- Patterns to use instead of the
+            pattern files (default: {{}})
+        compiled {bool} -- Whether the matchers are compiled to tries (default: {True})
+
+    Returns:
+        str -- Hexadecimal digests of the sources and of the variant
+    """
+    variant = hashlib.sha256(json.dumps(
+        [override_rows, compiled], sort_keys=True).encode('utf-8'))
+    return '%s-%s' % (source_key(lang), variant.hexdigest())
+
+
+def source_key(lang: str) -> str:
+    """Get a hash of the sources of the parsers of a language: the pattern
+    files and the code compiling them. All the cached parsers of a language
+    created from other sources are out of date.
+
+    Arguments:
+        lang {str} -- Language of the patterns
+
+    Returns:
+        str -- Hexadecimal digest
+    """
+    digest = hashlib.sha256()
+
+    def update(filename: str):
+        digest.update(filename.encode('utf-8'))
+        with open(filename, 'rb') as file:
+            digest.update(file.read())
+
+    update(patterns_path('%s.json' % lang))
+    for pattern in read_specification(lang)['patterns']:
+        update(patterns_path('%s_%s.csv' % (lang, pattern['name'])))
+
+    # the pickled objects are only valid for the code which created them
+    for directory, _, filenames in sorted(os.walk(PACKAGE_PATH)):
+        for filename in sorted(filenames):
+            # skip the tables generated by ply
+            if filename.endswith('.py') and not filename.endswith('_parsetab.py'):
+                update(os.path.join(directory, filename))
+
+    return digest.hexdigest()
+
+
+def load_parsers(lang: str, override_rows: Dict[str, List[str]] = {}, compiled=True) -> Dict[str, PatternParser]:
+    """Get the parsers of a language from the cache, or create and cache them
+    when the cache is missing or out of date. This behaves the same as
+    `create_parsers`.
+
+    Arguments:
+        lang {str} -- Language of the patterns
+
+    Keyword Arguments:
+        override_rows {Dict[str, List[str]]} -- Patterns to use instead of the
+            pattern files (default: {{}})
+        compiled {bool} -- Whether the matchers are compiled to tries (default: {True})
+
+    Returns:
+        Dict[str, PatternParser] -- The parsers by the name of their type
+    """
+    directory = cache_directory()
+    if directory is None:
+        return create_parsers(lang, override_rows, compiled)
+
+    key = cache_key(lang, override_rows, compiled)
+    filename = os.path.join(directory, '%s-%s.pickle' % (lang, key))
+    try:
+        with open(filename, 'rb') as file:
+            return cast(Dict[str, PatternParser], pickle.load(file))
+    except Exception:
+        # missing or unreadable, e.g. written by another Python version
+        pass
+
+    parsers = create_parsers(lang, override_rows, compiled)
+    try:
+        os.makedirs(directory, exist_ok=True)
+        # write to a temporary file first: other processes
+        # should never read a partially written cache
+        handle, temporary = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(handle, 'wb') as file:
+                pickle.dump(parsers, file, pickle.HIGHEST_PROTOCOL)
+            os.replace(temporary, filename)
+        except BaseException:
+            os.remove(temporary)
+            raise
+        remove_stale(directory, lang, key.split('-')[0])
+    except OSError:
+        # the cache is only an optimization
+        pass
+
+    return parsers
+
+
+def remove_stale(directory: str, lang: str, source: str) -> None:
+    """Remove the cached parsers of a language created from other sources:
+    these are out of date and would otherwise accumulate in the cache.
+    The parsers for other overrides created from the same sources are kept.
+
+    Arguments:
+        directory {str} -- Directory of the cache
+        lang {str} -- Language of the parsers
+        source {str} -- Digest of the current sources (see `source_key`)
+    """
+    current = '%s-%s-' % (lang, source)
+    for filename in glob.glob(os.path.join(directory, '%s-*.pickle' % glob.escape(lang))):
+        if not os.path.basename(filename).startswith(current):
+            try:
+                os.remove(filename)
+            except OSError:
+                # e.g. removed by another process
+                pass
@@ -1,24 +1,60 @@
 #!/usr/bin/env python3
+import json
 from os import path
-import yaml
-from typing import Dict, List
+from typing import cast, Any, Dict, List
 from .pattern_parser import PatternParser
-from .values import values
+from .values import templates, values
 
-def create_parsers(lang: str, override_rows: Dict[str, List[str]] = {}) -> Dict[str, PatternParser]:
-    with open(path.join(path.dirname(__file__), 'patterns', '%s.json' % lang), encoding='utf-8-sig') as file:
-        specification = yaml.safe_load(file)
+
+def patterns_path(filename: str) -> str:
+    return path.join(path.dirname(__file__), 'patterns', filename)
+
+
+def read_specification(lang: str) -> Dict[str, Any]:
+    with open(patterns_path('%s.json' % lang), encoding='utf-8-sig') as file:
+        return cast(Dict[str, Any], json.load(file))
+
+
+def create_parsers(lang: str,
+                   override_rows: Dict[str, List[str]] = {},
+                   compiled=True,
+                   base_parsers: Dict[str, PatternParser] = None) -> Dict[str, PatternParser]:
+    """Create the parsers for all the pattern types of a language.
+
+    Arguments:
+        lang {str} -- Language of the patterns
+
+    Keyword Arguments:
+        override_rows {Dict[str, List[str]]} -- Patterns to use instead of the
+            pattern files (default: {{}})
+        compiled {bool} -- Whether the matchers are compiled to tries (default: {True})
+        base_parsers {Dict[str, PatternParser]} -- Parsers previously created for the
+            same language (without overrides), these are reused for the types which
+            aren't affected by the overridden rows (default: {None})
+
+    Returns:
+        Dict[str, PatternParser] -- The parsers by the name of their type
+    """
+    specification = read_specification(lang)
 
     parsers: Dict[str, PatternParser] = {}
 
     for pattern in specification['patterns']:
         name = pattern['name']
-        dependencies = list(map(lambda subtype: parsers[subtype], (pattern.get('dependencies') or [])))
+        dependency_names = pattern.get('dependencies') or []
+        if base_parsers is not None and name not in override_rows \
+                and all(parsers[subtype] is base_parsers[subtype] for subtype in dependency_names):
+            parsers[name] = base_parsers[name]
+            continue
+
+        dependencies = list(map(lambda subtype: parsers[subtype], dependency_names))
         parsers[name] = PatternParser(
             '%s_%s.csv' % (lang, name),
             pattern['key'],
             values[pattern['eval']],
             dependencies,
-            override_rows.get(name))
+            override_rows.get(name),
+            compiled,
+            templates.get(pattern['eval']))
 
     return parsers
@@ -1,9 +1,44 @@
-from typing import Dict, Iterator, List, Union, Set, Tuple, TypeVar, cast
+import re
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Union, Set, Tuple, TypeVar, cast
 
 T = TypeVar('T', bound='TokenSpan')
 
+TEMPLATE_SLOT = re.compile(r'\{([^{}]*)\}')
+
+# Keys used to look up the parts which could match a span
+PartKey = Tuple[str, str]
+BACKREF_KEY = ('backref', '')
+
+
+def token_key(text: str) -> PartKey:
+    return ('token', text)
+
+
+def type_key(type: str) -> PartKey:
+    return ('type', type)
+
 
 class TokenSpan:
+    __slots__ = ['start',
+                 'interpretation_index',
+                 'interpretation_length',
+                 'subtoken_index',
+                 'last',
+                 'last_interpretation_index',
+                 'last_interpretation_length',
+                 'last_subtoken_index',
+                 'type',
+                 'len',
+                 'value',
+                 'is_captured',
+                 'is_child',
+                 'matcher',
+                 'state',
+                 '__tokens',
+                 '__text',
+                 '__evaluated',
+                 '__evaluate']
+
     def __init__(self,
                  start: int,
                  interpretation_index: int,
@@ -14,10 +49,12 @@ class TokenSpan:
                  last_interpretation_length: int,
                  last_subtoken_index: int,
                  type: Union[str, None],
-                 tokens: List[str],
+                 tokens: Sequence[Union[str, 'TokenSpan']],
                  value=None,
                  is_captured=False,
-                 is_child=False):
+                 is_child=False,
+                 matcher: 'PatternMatcher' = None,
+                 state: 'PatternMatcherState' = None):
         self.start = start
         self.interpretation_index = interpretation_index
         self.interpretation_length = interpretation_length
@@ -27,9 +64,21 @@ class TokenSpan:
         self.last_interpretation_length = last_interpretation_length
         self.last_subtoken_index = last_subtoken_index
         self.type = type
-        self.tokens = tokens
-        self.value = cast(str, value)
-        self.evaluated = value
+        # the (sub)tokens of this span, or the spans it consists of:
+        # these are only joined when the text is needed
+        self.__tokens = tokens
+        # (no cast: spans are created in the inner loop of the parser)
+        self.__text = None  # type: Optional[str]
+        # number of (sub)tokens
+        if len(tokens) == 1 and isinstance(tokens[0], str):
+            self.len = 1
+        else:
+            self.len = sum(1 if isinstance(token, str) else token.len
+                           for token in tokens)
+        self.value = value  # type: str
+        self.__evaluated = value
+        # computes the evaluated value on first access
+        self.__evaluate = None  # type: Optional[Callable[[], Any]]
         """Whether this span has been captured
         by another completed pattern and should therefor be omitted
         from the results as match.
@@ -38,31 +87,92 @@ class TokenSpan:
         """Whether this span is a match from a child pattern
         """
         self.is_child = is_child
+        """The matcher and its final state, if this is a match: the state
+        refers to the spans bound to the slots of the matcher
+        """
+        self.matcher = matcher
+        self.state = state
+
+    @property
+    def evaluated(self) -> Any:
+        """The evaluated value of this span, which is computed on first access
+        """
+        if self.__evaluate is not None:
+            self.__evaluated = self.__evaluate()
+            self.__evaluate = None
+        return self.__evaluated
+
+    @evaluated.setter
+    def evaluated(self, value: Any):
+        self.__evaluated = value
+        self.__evaluate = None
+
+    def evaluate_lazily(self, evaluate: Callable[[], Any]) -> None:
+        """Set the function to compute the evaluated value when it's needed.
+
+        Arguments:
+            evaluate {Callable[[], Any]} -- Computes the value
+        """
+        self.__evaluate = evaluate
+
+    @property
+    def bindings(self) -> Dict[str, 'TokenSpan']:
+        """The spans bound to the slots of the matcher
+        """
+        if self.state is None:
+            return {}
+        return self.state.bindings
 
     @property
-    def text(self):
-        return ' '.join(self.tokens)
+    def text(self) -> str:
+        if self.__text is None:
+            self.__text = ' '.join(token if isinstance(token, str) else token.text
+                                   for token in self.__tokens)
+        return self.__text
 
     @property
-    def len(self):
-        return len(self.tokens)
+    def tokens(self) -> List[str]:
+        tokens = cast(List[str], [])
+        for token in self.__tokens:
+            if isinstance(token, str):
+                tokens.append(token)
+            else:
+                tokens += token.tokens
+        return tokens
+
+    def part_keys(self) -> List[PartKey]:
+        """Keys of the parts which could match this span.
 
-    def clone(self, override_type: str = None, is_child = False):
+        Returns:
+            List[PartKey] -- Keys to look up the parts
+        """
+        if self.type is None:
+            return [token_key(self.text)]
+        return [token_key(self.text), type_key(self.type), BACKREF_KEY]
+
+    def clone(self, override_type: str = None, is_child = False, offset: int = 0):
         cloned = TokenSpan(
-            self.start,
+            self.start + offset,
             self.interpretation_index,
             self.interpretation_length,
             self.subtoken_index,
-            self.last,
+            self.last + offset,
             self.last_interpretation_index,
             self.last_interpretation_length,
             self.last_subtoken_index,
             override_type or self.type,
-            self.tokens,
+            self.__tokens,
             self.value,
             self.is_captured,
-            is_child)
-        cloned.evaluated = self.evaluated
+            is_child,
+            self.matcher)
+        cloned.__text = self.__text
+        if self.__evaluate is None:
+            cloned.evaluated = self.__evaluated
+        else:
+            # evaluate once, when either is needed: the clone is evaluated
+            # by this span, so it doesn't need the bound spans
+            cloned.evaluate_lazily(lambda: self.evaluated)
         return cloned
 
     def precedes(self, following: T) -> bool:
@@ -136,9 +246,11 @@ class TokenSpan:
 class TokenPart:
     def __init__(self, compare: str):
         self.text = compare
+        self.key = token_key(compare)
 
     def test(self, span: TokenSpan) -> bool:
-        return cast(bool, self.text == span.text)
+        # a token never contains a space
+        return span.len == 1 and self.text == span.text
 
     def __str__(self):
         return f"\"{self.text}\""
@@ -147,6 +259,7 @@ class TokenPart:
 class BackrefPart:
     def __init__(self, id: str):
         self.name = id
+        self.key = BACKREF_KEY
 
     def test(self, span: TokenSpan) -> bool:
         return span.type != None
@@ -159,6 +272,7 @@ class ChildPart:
     def __init__(self, type: str, name: str):
         self.type = type
         self.name = name
+        self.key = type_key(type)
 
     def test(self, span: TokenSpan) -> bool:
         return self.type == span.type
@@ -171,6 +285,7 @@ class TypePart:
     def __init__(self, type: str, name: str):
         self.type = type
         self.name = name
+        self.key = type_key(type)
 
     def test(self, span: TokenSpan) -> bool:
         return self.type == span.type
@@ -179,11 +294,40 @@ class TypePart:
         return f"{{{self.name}}}" if self.name == self.type else f"{{{self.name}:{self.type}}}"
 
 
+Part = Union[TokenPart, BackrefPart, ChildPart, TypePart]
+
+
 class PatternMatcher:
-    def __init__(self, type: str, template: str, parts: List[Union[TokenPart, TypePart]]):
+    def __init__(self, type: str, template: str, parts: List[Part], value_template=None):
         self.type = type
         self.template = template
+        # the literal text of the template alternated by the names of its
+        # slots, e.g. ['(', 'a', '*10+', 'b', ')']
+        self.segments = TEMPLATE_SLOT.split(template)
         self.parts = parts
+        # the template compiled for evaluating the values of matches, if possible
+        self.value_template = value_template
+
+    def fill(self, bindings: Dict[str, TokenSpan]) -> str:
+        """Fill the template using the bound spans, slots without
+        a bound span are kept as-is.
+
+        Arguments:
+            bindings {Dict[str, TokenSpan]} -- The spans bound to the slots
+
+        Returns:
+            str -- The filled template
+        """
+        segments = self.segments
+        output = [segments[0]]
+        for index in range(1, len(segments), 2):
+            name = segments[index]
+            try:
+                output.append(str(bindings[name].evaluated))
+            except KeyError:
+                output.append(f'{{{name}}}')
+            output.append(segments[index + 1])
+        return ''.join(output)
 
     def dictionary(self) -> Iterator[str]:
         """Get all the tokens which are used in the pattern.
@@ -195,21 +339,79 @@ class PatternMatcher:
                    (part for part in self.parts if isinstance(part, TokenPart)))
 
 
-U = TypeVar('U', bound='PatternMatcherState')
+class PatternNode:
+    """Node within a trie of pattern matchers: patterns starting with
+    the same parts share the nodes for those parts, and are only split
+    where they diverge.
+    """
+
+    def __init__(self) -> None:
+        # part key -> the parts with that key and the nodes following them
+        self.children: Dict[PartKey, List[Tuple[Part, 'PatternNode']]] = {}
+
+        # matchers of the patterns which are complete at this node
+        self.matchers: List[PatternMatcher] = []
+
+    def add(self, matcher: PatternMatcher, parts_index: int = 0) -> None:
+        """Add the (remaining) parts of a pattern to the trie.
+
+        Arguments:
+            matcher {PatternMatcher} -- Matcher of the pattern to add
+            parts_index {int} -- Index of the part to add to this node
+        """
+        if parts_index == len(matcher.parts):
+            self.matchers.append(matcher)
+            return
+
+        part = matcher.parts[parts_index]
+        edges = self.children.setdefault(part.key, [])
+        for edge_part, node in edges:
+            if str(edge_part) == str(part) and type(edge_part) == type(part):
+                # the same part and name: share the node
+                break
+        else:
+            node = PatternNode()
+            edges.append((part, node))
+
+        node.add(matcher, parts_index + 1)
 
 
 class PatternMatcherState():
-    def __init__(self, matcher: PatternMatcher):  # , position: int = 0):
-        self.matcher = matcher
+    """State within a trie of patterns. States are persistent: a state
+    refers to the state it continues, and only adds its last span (and
+    the name it is bound to). This way continuing a state never copies
+    anything, the spans and bindings are only collected when emitting.
+    """
 
-        # a matcher is a list of parts to match, this sets the index
-        self.parts_index = 0
+    __slots__ = ['node', 'parent', 'span', 'name']
 
-        self.spans = cast(List[TokenSpan], [])
+    def __init__(self,
+                 node: PatternNode,
+                 parent: 'PatternMatcherState' = None,
+                 span: TokenSpan = None,
+                 name: str = None):
+        self.node = node
+        # the state this state continues
+        self.parent = parent
+        # the last span of this state
+        self.span = span
+        # the id the last span is bound to in this pattern
+        self.name = name
 
-        # contains the string values for each id present
-        # in this pattern
-        self.values = cast(Dict[str, str], {})
+    @property
+    def expected(self) -> Iterable[PartKey]:
+        """Keys of the parts this state expects next
+
+        Returns:
+            Iterable[PartKey] -- Keys of the possible next parts of the patterns
+        """
+        return self.node.children.keys()
+
+    @property
+    def is_complete(self) -> bool:
+        """Whether patterns are complete at this state
+        """
+        return len(self.node.matchers) > 0
 
     @property
     def position(self) -> int:
@@ -219,90 +421,108 @@ class PatternMatcherState():
             int -- Last inclusive(!) index of this pattern in the
                 tokenized input
         """
-        try:
-            return self.spans[-1].last
-        except IndexError:
+        if self.span is None:
             return 0
+        return self.span.last
 
-    def test(self, span: TokenSpan) -> Tuple[bool, bool]:
-        """Test whether the current token matches the pattern.
+    @property
+    def spans(self) -> List[TokenSpan]:
+        """The spans matched by this state, in order
+        """
+        spans = []
+        state = self  # type: Optional[PatternMatcherState]
+        while state is not None and state.span is not None:
+            spans.append(state.span)
+            state = state.parent
+        spans.reverse()
+        return spans
+
+    @property
+    def bindings(self) -> Dict[str, TokenSpan]:
+        """The spans bound to each id present in this pattern
+        """
+        bound = cast(List[Tuple[str, TokenSpan]], [])
+        state = self  # type: Optional[PatternMatcherState]
+        while state is not None:
+            if state.name is not None:
+                # a bound state always has a span
+                bound.append((state.name, cast(TokenSpan, state.span)))
+            state = state.parent
+        bindings = cast(Dict[str, TokenSpan], {})
+        # a later binding of an id replaces an earlier one
+        for name, span in reversed(bound):
+            bindings[name] = span
+        return bindings
+
+    def test(self, span: TokenSpan) -> bool:
+        """Test whether the span directly follows this state.
 
         Arguments:
             span {TokenSpan} -- Span to test against for possible
                 continuation
-            matches {List[PatternMatcherState]} -- Other matches on this position
 
         Returns:
-            Tuple[bool, bool] -- 0: Whether this span matches and the pattern can continue,
-                1: Whether this entails a backreference
+            bool -- Whether the patterns could continue on this span
         """
-        if len(self.spans) > 0 and not self.spans[-1].precedes(span):
-            return False, False
-
-        part = self.matcher.parts[self.parts_index]
-        if part.test(span):
-            return True, False
-        return False, False
+        return self.span is None or self.span.precedes(span)
 
-    def next(self, span: TokenSpan) -> bool:
-        """Move the index forward within the pattern using the given span.
-        It is assumed that the span fits the pattern (use {test()} to check).
+    def next(self, span: TokenSpan, key: PartKey) -> List['PatternMatcherState']:
+        """Move forward within the patterns using the given span for
+        each part with the given key accepting it.
+        It is assumed that the span follows this state (use {test()} to check).
 
         Arguments:
             span {TokenSpan} -- Span to assign to this pattern position
                 if this is needed.
+            key {PartKey} -- Key of the parts to test
 
         Returns:
-            bool -- Whether the pattern is complete
+            List[PatternMatcherState] -- The continued states
         """
-        part = self.matcher.parts[self.parts_index]
-        if isinstance(part, TypePart) or isinstance(part, BackrefPart):
-            # assign the value for this span
-            self.values[part.name] = span.evaluated
-
-        self.parts_index += 1
-        self.spans.append(span)
-        if self.parts_index == len(self.matcher.parts):
-            # notify all the spans that they have been captured,
-            # and should be omitted from the (usual) results
-            for s in self.spans:
-                s.is_captured = True
-
-            return True
-        return False
-
-    def emit(self) -> TokenSpan:
-        tokens = cast(List[str], [])
-        for span in self.spans:
-            tokens += span.tokens
-        output = self.matcher.template
-        for id, value in self.values.items():
-            output = self.__fill_template(output, id, value)
-        start = self.spans[0]
-        end = self.spans[-1]
-        return TokenSpan(
-            start.start,
-            start.interpretation_index,
-            start.interpretation_length,
-            start.subtoken_index,
-            end.last,
-            end.last_interpretation_index,
-            end.last_interpretation_length,
-            end.last_subtoken_index,
-            self.matcher.type,
-            tokens,
-            output)
-
-    def clone(self: U) -> U:
-        clone = PatternMatcherState(self.matcher)
-        clone.parts_index = self.parts_index
-        clone.spans.extend(self.spans)
-        clone.values = {** self.values}
-        return cast(U, clone)
-
-    def __fill_template(self, template: str, id: str, value) -> str:
-        return template.replace(f'{{{id}}}', str(value))
+        next_states = []
+        for part, node in self.node.children.get(key, ()):
+            if part.test(span):
+                if isinstance(part, TypePart) or isinstance(part, BackrefPart):
+                    # assign the value for this span
+                    next_states.append(PatternMatcherState(node, self, span, part.name))
+                else:
+                    next_states.append(PatternMatcherState(node, self, span))
+        return next_states
+
+    def emit(self) -> List[TokenSpan]:
+        spans = self.spans
+        bindings = self.bindings
+
+        # notify all the spans that they have been captured,
+        # and should be omitted from the (usual) results
+        for s in spans:
+            s.is_captured = True
+
+        # a (sub)token is kept as its text: only the spans of the
+        # matches are needed to determine the text and tokens
+        tokens = tuple(span.text if span.type is None else span for span in spans)
+        start = spans[0]
+        end = spans[-1]
+
+        emitted = cast(List[TokenSpan], [])
+        for matcher in self.node.matchers:
+            emitted.append(TokenSpan(
+                start.start,
+                start.interpretation_index,
+                start.interpretation_length,
+                start.subtoken_index,
+                end.last,
+                end.last_interpretation_index,
+                end.last_interpretation_length,
+                end.last_subtoken_index,
+                matcher.type,
+                tokens,
+                matcher.fill(bindings),
+                matcher=matcher,
+                # the bound spans are only needed to evaluate the value template
+                state=self if matcher.value_template is not None else None))
+        return emitted
 
     def __str__(self):
-        parts_str = " ".join(str(part) for part in self.matcher.parts)
-        return f"({self.matcher.type}) \"{parts_str}\""
+        spans_str = " ".join(span.text for span in self.spans)
+        return f"\"{spans_str}\" -> {len(self.node.children)} parts, {len(self.node.matchers)} matchers"
@@ -3,9 +3,11 @@ import csv
 import os
 import re
 
+from bisect import bisect_left, bisect_right
 from collections import ChainMap
-from typing import cast, Any, Callable, Dict, Iterable, List, Set, Tuple, Union, Pattern, Optional, TypeVar
-from functools import reduce
+from typing import cast, Any, Callable, Dict, Iterable, Iterator, List, MutableSet, Set, Tuple, Union, Pattern, Optional, TypeVar
+from functools import partial, reduce
+from weakref import WeakSet
 
 from .grammars.pattern_grammar import get_parts
 from .chart_parser import ChartParser
@@ -15,6 +17,86 @@ from historic_hebrew_dates.pattern_matcher import BackrefPart, ChildPart, TokenP
 
 T = TypeVar('T', bound='PatternParser')
 
+# the text from its first to its last token
+TRIMMED = re.compile(r'\S(?:.*\S)?', re.DOTALL)
+
+# maximum number of characters of a streamed word to wait for
+# its continuation, longer words are split
+MAX_PENDING = 10000
+
+
+class ParseSession:
+    """Parses a single input once for each pattern type, this way
+    the results of a dependency can be shared by all its dependents.
+    """
+
+    def __init__(self, tokens: List[FragmentedToken]):
+        self.tokens = tokens
+        self.results = cast(Dict['PatternParser', List[List[TokenSpan]]], {})
+
+    def parse(self, parser: 'PatternParser') -> List[List[TokenSpan]]:
+        """Get the matches of the parser on the input of this session,
+        only the first request actually runs the parser.
+
+        Arguments:
+            parser {PatternParser} -- The parser to run
+
+        Returns:
+            List[List[TokenSpan]] -- Matches at each token position
+        """
+        try:
+            return self.results[parser]
+        except KeyError:
+            results = parser.parse(self.tokens, session=self)
+            self.results[parser] = results
+            return results
+
+
+def dominates(match: TokenSpan, candidate: TokenSpan) -> bool:
+    """Whether a match hides another match: it fully contains
+    the other match and it is longer or has the same text.
+    """
+    return match is not candidate \
+        and match.contains(candidate) \
+        and (match.len > candidate.len
+             or match.text == candidate.text)
+
+
+class _SweepIndex:
+    """Matches ordered by their last token, for finding the matches
+    which could contain a match.
+
+    Only the matches which still span the current token are kept (see
+    `prune`): adding a match and checking whether a match is dominated
+    take time linear in the number of these matches. The worst case is
+    quadratic in the number of matches when (nearly) all of them overlap,
+    the same as comparing them pairwise.
+    """
+
+    def __init__(self):
+        self.lasts = cast(List[int], [])
+        self.matches = cast(List[TokenSpan], [])
+
+    def add(self, match: TokenSpan) -> None:
+        index = bisect_right(self.lasts, match.last)
+        self.lasts.insert(index, match.last)
+        self.matches.insert(index, match)
+
+    def prune(self, token_index: int) -> None:
+        """Remove the matches ending before the token, these can't
+        contain a match starting at or after it.
+        """
+        index = bisect_left(self.lasts, token_index)
+        if index:
+            del self.lasts[:index]
+            del self.matches[:index]
+
+    def dominated(self, candidate: TokenSpan) -> bool:
+        for index in range(bisect_left(self.lasts, candidate.last), len(self.matches)):
+            if dominates(self.matches[index], candidate):
+                return True
+        return False
+
 
 class PatternParser:
     def __init__(self,
@@ -22,12 +104,19 @@ class PatternParser:
                  type: str,
                  eval_func: Callable[[str], Any],
                  child_patterns: List[T] = [],
-                 rows=None):
+                 rows=None,
+                 compiled=True,
+                 compile_value: Callable[[str], Any] = None):
         self.type = type
+        self.compiled = compiled
+        self.compile_value = compile_value
         self.child_patterns = child_patterns
+        # parsers using this parser as a child pattern
+        self.dependents = cast(MutableSet[PatternParser], WeakSet())
         self.child_dictionaries = cast(Set[str], set())
         for child in child_patterns:
             self.child_dictionaries |= child.dictionary()
+            child.dependents.add(self)
 
         self.eval = eval_func
         if rows:
@@ -38,56 +127,300 @@ class PatternParser:
                 next(rows)  # skip header
                 self.__parse_rows(rows)
 
-    def __parse_rows(self, rows: List[List[str]]):
-        grouped_patterns_str: Dict[str, List[Tuple[str, str]]] = {}
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        # weak references can't be pickled
+        del state['dependents']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.dependents = WeakSet()
+        for child in self.child_patterns:
+            child.dependents.add(self)
+
+    def __parse_rows(self, rows: Iterable[List[str]]):
+        self.rows = cast(List[List[str]], [])
+        # the matcher compiled from each row
+        self.row_matchers = cast(List[PatternMatcher], [])
+        for row in rows:
+            self.rows.append(row)
+            self.row_matchers.append(self.__compile_row(row))
+
+        self.parser = ChartParser(self.__agenda(), self.compiled)
+        self.tokenizer = Tokenizer(self.dictionary())
+
+    def __compile_row(self, row: List[str]) -> PatternMatcher:
+        pattern_type: str = row[0]
+        pattern: str = row[1]
+        expression: str = row[2]
+        return self.__compile_matcher(
+            pattern_type,
+            expression,
+            get_parts(pattern))
+
+    def __agenda(self) -> List[PatternMatcher]:
         # Start with terminal expression, make sure patterns only
         # rely on preceding types: that way a pattern for the entire
         # dependent type can be constructed first and used in the following
         # types.
-        pattern_type_order: List[str] = []
+        pattern_type_order: Dict[str, int] = {}
+        for matcher in self.row_matchers:
+            pattern_type_order.setdefault(matcher.type, len(pattern_type_order))
+
+        return sorted(self.row_matchers,
+                      key=lambda matcher: pattern_type_order[matcher.type])
+
+    def add_rows(self, rows: Iterable[List[str]]) -> None:
+        """Add patterns to this parser, only the new patterns are compiled.
+
+        Arguments:
+            rows {Iterable[List[str]]} -- Rows with the type, pattern and value
+                (the same as in the pattern files)
+        """
+        # only change the parser if all the rows are valid
+        rows = list(rows)
+        matchers = [self.__compile_row(row) for row in rows]
+        self.rows += rows
+        self.row_matchers += matchers
+        self.__update()
+
+    def remove_rows(self, rows: Iterable[List[str]]) -> None:
+        """Remove patterns from this parser.
+
+        Arguments:
+            rows {Iterable[List[str]]} -- Rows to remove, the first equal row is
+                removed for each
+
+        Raises:
+            ValueError -- A row isn't part of this parser
+        """
+        # only change the parser if all the rows are found
+        remaining = list(self.rows)
+        remaining_matchers = list(self.row_matchers)
         for row in rows:
-            pattern_type: str = row[0]
-            pattern: str = row[1]
-            expression: str = row[2]
-            if not pattern_type in pattern_type_order:
-                pattern_type_order.append(pattern_type)
-            if not pattern_type in grouped_patterns_str:
-                grouped_patterns_str[pattern_type] = []
-            grouped_patterns_str[pattern_type].append((pattern, expression))
-
-        matchers = cast(List[PatternMatcher], [])
-        for pattern_type in pattern_type_order:
-            for pattern, expression in grouped_patterns_str[pattern_type]:
-                parts = get_parts(pattern)
-                matcher = self.__compile_matcher(
-                    pattern_type,
-                    expression,
-                    parts)
-
-                matchers.append(matcher)
-
-        self.parser = ChartParser(matchers)
-        self.tokenizer = Tokenizer(self.dictionary())
+            index = remaining.index(row)
+            del remaining[index]
+            del remaining_matchers[index]
+        self.rows = remaining
+        self.row_matchers = remaining_matchers
+        self.__update()
+
+    def replace_row(self, row: List[str], replacement: List[str]) -> None:
+        """Replace a pattern of this parser, keeping its position.
+
+        Arguments:
+            row {List[str]} -- Row to replace, the first equal row is replaced
+            replacement {List[str]} -- The new row
+
+        Raises:
+            ValueError -- The row isn't part of this parser
+        """
+        index = self.rows.index(row)
+        matcher = self.__compile_row(replacement)
+        self.rows[index] = replacement
+        self.row_matchers[index] = matcher
+        self.__update()
+
+    def __update(self):
+        self.parser.set_agenda(self.__agenda())
+        self.__update_dictionary()
+
+    def __update_dictionary(self):
+        self.tokenizer.update(self.dictionary())
+        # the dictionary of this parser is part of the dictionaries
+        # of the parsers depending on it
+        for dependent in self.dependents:
+            dependent.update_child_dictionaries()
+
+    def update_child_dictionaries(self):
+        """Update the dictionary after changes to the dictionary
+        of a child pattern.
+        """
+        self.child_dictionaries = cast(Set[str], set())
+        for child in self.child_patterns:
+            self.child_dictionaries |= child.dictionary()
+        self.__update_dictionary()
 
     def dictionary(self) -> Set[str]:
         return self.parser.dictionary() | self.child_dictionaries
 
-    def search(self, text: str):
+    def max_span(self) -> int:
+        """Get the maximum number of tokens a match of this parser could span.
+
+        Returns:
+            int -- Upper bound of the length of a match
+        """
+        spans = {child.type: child.max_span() for child in self.child_patterns}
+        longest = 0
+        for matcher in self.parser.agenda:
+            length = 0
+            for part in matcher.parts:
+                if isinstance(part, TokenPart):
+                    length += 1
+                elif isinstance(part, BackrefPart):
+                    length += max(spans.values(), default=0)
+                else:
+                    length += spans.get(part.type, 0)
+            spans[matcher.type] = max(spans.get(matcher.type, 0), length)
+            longest = max(longest, length)
+        return longest
+
+    def context_span(self) -> int:
+        """Get the number of tokens surrounding a match, which could affect
+        whether it is a (visible) result. These are the possibly overlapping
+        matches of this parser and its dependencies.
+
+        Returns:
+            int -- Number of tokens before and after a match
+        """
+        return self.max_span() + max((child.context_span() for child in self.child_patterns), default=0)
+
+    def search(self, text: str, prefilter=True):
+        """Search a text for matches.
+
+        Arguments:
+            text {str} -- The text to search
+
+        Keyword Arguments:
+            prefilter {bool} -- Skip the text which can't be part of a match:
+                only the runs of known tokens are parsed (default: {True})
+
+        Returns:
+            List[Dict[str, Any]] -- The matched and unmatched parts of the text
+        """
+        if prefilter and not self.tokenizer.contains_known(text):
+            # none of the tokens could be matched
+            return self.__format_unmatched(text)
+
         tokens = list(self.tokenizer.tokenize(text))
-        matches = self.parse(tokens)
+        if prefilter:
+            matches = self.__parse_known(tokens)
+        else:
+            matches = self.parse(tokens)
 
-        return list(self.__format_matches(tokens, matches))
+        return list(self.__format_matches(text, tokens, matches))
 
-    def parse(self, tokens: Union[str, List[FragmentedToken]], omit_captured=True, hide_overlap=True, eval_values=True) -> List[List[TokenSpan]]:
-        self.parser.reset()
+    def search_stream(self, texts: Union[str, Iterable[str]], window: int = 1000) -> Iterator[Dict[str, Any]]:
+        """Search a (long) text which is read piece by piece, e.g. the lines of a file.
+        Only a window of tokens is kept in memory and the matches are yielded
+        as soon as no following text could change them.
+
+        Each window is parsed from scratch: the context and the longest
+        possible match preceding the new tokens are parsed again, a larger
+        window reduces this overhead. A word is split if it exceeds
+        MAX_PENDING characters without any whitespace.
+
+        Arguments:
+            texts {Union[str, Iterable[str]]} -- Consecutive parts of the text
+
+        Keyword Arguments:
+            window {int} -- Minimum number of new tokens to parse at once (default: {1000})
+
+        Yields:
+            Iterator[Dict[str, Any]] -- The matches with their offsets in the entire text
+        """
+        if isinstance(texts, str):
+            texts = [texts]
+
+        context = self.context_span()
+        max_span = self.max_span()
+
+        # the tokens which could still be part of a match
+        tokens = cast(List[FragmentedToken], [])
+        # number of tokens of which all the matches have been yielded
+        emitted = 0
+        # number of tokens before the window
+        dropped = 0
+
+        offset = 0
+        pending = ''
+        for text in texts:
+            text = pending + text
+            # the last word might continue in the next part
+            cut = len(text)
+            while cut > 0 and not text[cut - 1].isspace():
+                cut -= 1
+            if len(text) - cut > MAX_PENDING:
+                # don't keep growing without any whitespace
+                cut = len(text)
+            tokens += self.tokenizer.tokenize(text[:cut], offset)
+            offset += cut
+            pending = text[cut:]
+
+            while len(tokens) + dropped - emitted >= window + context + max_span:
+                # matches starting before the limit can no longer be affected
+                # by any following text
+                limit = len(tokens) - context - max_span + 1
+                yield from self.__stream_matches(tokens, emitted - dropped, limit)
+                emitted = dropped + limit
+                # keep the context of the following matches
+                keep = max(0, limit - context)
+                dropped += keep
+                del tokens[:keep]
+
+        tokens += self.tokenizer.tokenize(pending, offset)
+        if tokens:
+            yield from self.__stream_matches(tokens, emitted - dropped, len(tokens))
+
+    def __stream_matches(self, tokens: List[FragmentedToken], start: int, limit: int) -> Iterator[Dict[str, Any]]:
+        matches = self.__parse_known(tokens)
+        for token_matches in matches[start:limit]:
+            for span in token_matches:
+                yield self.__format_match(tokens, span)
+
+    def __parse_known(self, tokens: List[FragmentedToken]) -> List[List[TokenSpan]]:
+        """Parse the runs of known tokens separately. A match only consists
+        of known tokens, so the unknown tokens in between can't be part of
+        any match and the matches in different runs never overlap.
+
+        Arguments:
+            tokens {List[FragmentedToken]} -- The tokens to parse
 
+        Returns:
+            List[List[TokenSpan]] -- Matches at each token position
+        """
+        runs = cast(List[Tuple[int, int]], [])
+        start = None
+        for index, token in enumerate(tokens):
+            if token.known:
+                if start is None:
+                    start = index
+            elif start is not None:
+                runs.append((start, index))
+                start = None
+        if start is not None:
+            runs.append((start, len(tokens)))
+
+        if runs == [(0, len(tokens))]:
+            return self.parse(tokens)
+
+        matches = cast(List[List[TokenSpan]], [[] for _ in tokens])
+        for start, end in runs:
+            for token_matches in self.parse(tokens[start:end])[:end - start]:
+                for match in token_matches:
+                    matches[match.start + start].append(
+                        match.clone(is_child=match.is_child, offset=start))
+        return matches
+
+    def parse(self,
+              tokens: Union[str, List[FragmentedToken]],
+              omit_captured=True,
+              hide_overlap=True,
+              eval_values=True,
+              session: ParseSession = None,
+              overlap_method='sweep') -> List[List[TokenSpan]]:
         if type(tokens) is str:
             tokens = list(self.tokenizer.tokenize(cast(str, tokens)))
 
+        if session is None:
+            session = ParseSession(cast(List[FragmentedToken], tokens))
+
+        self.parser.reset()
         self.parser.input(cast(List[FragmentedToken], tokens))
 
         for child in self.child_patterns:
-            self.parser.add_child_matches(child.type, child.parse(tokens))
+            self.parser.add_child_matches(child.type, session.parse(child))
 
         self.parser.process_all()
         matches = self.parser.matches
@@ -97,16 +430,101 @@ class PatternParser:
                     lambda match: not match.is_captured, token_matches)),
                 matches))
         if hide_overlap:
-            matches = self.__hide_overlap(matches)
+            if overlap_method == 'pairwise':
+                matches = self.__hide_overlap_pairwise(matches)
+            else:
+                matches = self.__hide_overlap(matches)
         if eval_values:
+            # the values are only evaluated when they are needed
+            results = cast(Dict[int, Any], {})
             for token_matches in matches:
                 for match in token_matches:
                     if not match.is_child:
-                        match.evaluated = self.eval(match.value)
+                        match.evaluate_lazily(
+                            partial(self.__evaluate, match, results))
         return cast(List[List[TokenSpan]], matches)
 
-    def __hide_overlap(self, matches: List[List[TokenSpan]]):
-        """Hide matches which are fully overlapped by another match
+    def __evaluate(self, match: TokenSpan, results: Dict[int, Any]) -> Any:
+        """Evaluate a match, using its compiled value template if possible.
+        Otherwise the filled template is evaluated.
+
+        Arguments:
+            match {TokenSpan} -- The match to evaluate
+            results {Dict[int, Any]} -- Results of the compiled templates by span id,
+                a span can be bound by multiple matches
+
+        Returns:
+            Any -- The evaluated value
+        """
+        if match.matcher is not None and match.matcher.value_template is not None:
+            try:
+                return match.matcher.value_template.value(self.__evaluate_template(match, results))
+            except ValueError:
+                pass
+        return self.eval(match.value)
+
+    def __evaluate_template(self, span: TokenSpan, results: Dict[int, Any]) -> Any:
+        if span.is_child:
+            return span.evaluated
+        try:
+            return results[id(span)]
+        except KeyError:
+            pass
+
+        template = span.matcher.value_template if span.matcher is not None else None
+        if template is None:
+            raise ValueError('No compiled template')
+        result = template.evaluate({
+            name: self.__evaluate_template(bound, results)
+            for name, bound in span.bindings.items()})
+        results[id(span)] = result
+        # the result is looked up from now on, release the bound spans
+        span.state = None
+        return result
+
+    def __hide_overlap(self, matches: List[List[TokenSpan]]) -> List[List[TokenSpan]]:
+        """Hide matches which are fully overlapped by another match.
+        This gives the same result as comparing all the matches pairwise
+        (see __hide_overlap_pairwise) by sweeping over the matches in order,
+        only comparing a match with the (visible) matches ending at or after it.
+        Each match is compared with at most the matches overlapping its
+        first token, so this is still quadratic in the worst case (see
+        _SweepIndex).
+
+        Arguments:
+            matches {List[List[TokenSpan]]} -- matches to filter
+
+        Returns:
+            List[List[TokenSpan]] -- Filtered matches
+        """
+
+        # A match hides the visible matches it dominates, so a match is
+        # hidden if it is dominated by a match which was still visible when
+        # it was checked (in the order of the matches).
+        checked = _SweepIndex()
+        visible = cast(Set[int], set())
+        for token_index, token_matches in enumerate(matches):
+            checked.prune(token_index)
+            for match in token_matches:
+                if not checked.dominated(match):
+                    checked.add(match)
+                    visible.add(id(match))
+
+        swept = _SweepIndex()
+        filtered_matches = cast(List[List[TokenSpan]], [])
+        for token_index, token_matches in enumerate(matches):
+            swept.prune(token_index)
+            for match in token_matches:
+                if id(match) in visible:
+                    swept.add(match)
+            filtered_matches.append(
+                [match for match in token_matches if not swept.dominated(match)])
+
+        return filtered_matches
+
+    def __hide_overlap_pairwise(self, matches: List[List[TokenSpan]]):
+        """Hide matches which are fully overlapped by another match,
+        by comparing each match with all the matches within its span.
 
         Arguments:
             matches {List[List[TokenSpan]]} -- matches to filter
@@ -129,10 +547,7 @@ class PatternParser:
         for token_index in range(match.start, match.last + 1):
             token_matches = matches[token_index]
             for candidate in list(token_matches):
-                if match != candidate and candidate in token_matches \
-                        and match.contains(candidate) \
-                        and (match.len > candidate.len
-                             or match.text == candidate.text):
+                if candidate in token_matches and dominates(match, candidate):
                     token_matches.remove(candidate)
 
     def __convert_part(self, part):
@@ -163,47 +578,79 @@ class PatternParser:
         return PatternMatcher(
             pattern_type,
             expression,
-            reduce(list.__add__, (self.__convert_part(part) for part in parts)))
+            reduce(list.__add__, (self.__convert_part(part) for part in parts)),
+            self.compile_value(expression) if self.compile_value else None)
+
+    def __format_match(self, tokens: List[FragmentedToken], span: TokenSpan) -> Dict[str, Any]:
+        return {
+            'parsed': span.value,
+            'type': span.type,
+            'eval': span.evaluated,
+            'interpretation': span.text,
+            'start': tokens[span.start].start,
+            'end': tokens[span.last].end
+        }
+
+    def __format_unmatched(self, text: str) -> List[Dict[str, Any]]:
+        """Format a text without any matches, as a single part
+        from its first to its last token.
+        """
+        trimmed = TRIMMED.search(text)
+        if not trimmed:
+            return []
+        return [{
+            'text': trimmed.group(),
+            'start': trimmed.start(),
+            'end': trimmed.end()
+        }]
+
+    def __format_matches(self, text: str, tokens: List[FragmentedToken], matches: List[List[TokenSpan]]):
+        """Group the tokens to the matches starting at them, or to the
+        (unmatched) text between them.
+
+        Arguments:
+            text {str} -- The tokenized text
+            tokens {List[FragmentedToken]} -- Tokens of the text
+            matches {List[List[TokenSpan]]} -- Matches at each token position
 
-    def __format_matches(self, tokens: List[FragmentedToken], matches: List[List[TokenSpan]]):
+        Yields:
+            Dict[str, Any] -- The text, its character offsets and the matches starting at it
+        """
         current = cast(Dict[str, Any], {})
         match_until = 0
 
+        def start_text(token: FragmentedToken, **kwargs) -> Dict[str, Any]:
+            return {
+                'text': token.text,
+                'start': token.start,
+                'end': token.end,
+                **kwargs
+            }
+
         for i in range(0, len(tokens)):
             token = tokens[i]
             match = matches[i]
             if not match:
                 if current == {}:
-                    current = {
-                        'text': token.text
-                    }
+                    current = start_text(token)
                 elif 'matches' in current and match_until < i + 1:
                     for current_match in current['matches']:
                         if current_match['interpretation'] == current['text']:
                             del current_match['interpretation']
                     yield current
-                    current = {
-                        'text': token.text
-                    }
+                    current = start_text(token)
                 else:
-                    current['text'] += ' ' + token.text
+                    current['end'] = token.end
+                    current['text'] = text[current['start']:current['end']]
             else:
                 if current:
                     yield current
                 mapped_matches = []
                 for span in match:
-                    mapped_matches.append({
-                        'parsed': span.value,
-                        'type': span.type,
-                        'eval': span.evaluated,
-                        'interpretation': span.text
-                    })
+                    mapped_matches.append(self.__format_match(tokens, span))
                     if span.last + 1 > match_until:
                         match_until = span.last + 1
 
-                current = {
-                    'text': token.text,
-                    'matches': mapped_matches
-                }
+                current = start_text(token, matches=mapped_matches)
         if current:
             yield current
@@ -1,46 +1,247 @@
-from typing import Iterable, List, Set
+from bisect import bisect_left, insort
+from functools import lru_cache
+from typing import cast, Any, Dict, Iterable, List, Pattern, Set, Tuple
 import re
 
+# key in a trie node for the dictionary item ending there
+TRIE_END = ''
+
+WILDCARDS = re.compile(r'[?.]')
+REGEX_CHARACTERS = set('^$*+{}[]\\|()')
+
+
+@lru_cache(maxsize=1024)
+def wildcard_pattern(item: str) -> Pattern:
+    """Compile the expression for matching a token containing wildcards.
+
+    Arguments:
+        item {str} -- Token with ? and/or . as wildcards
+
+    Returns:
+        Pattern -- Compiled expression matching complete tokens
+    """
+    return re.compile(
+        '^' + item.replace('?', '.').replace('.', '.*') + '$', re.IGNORECASE)
+
+
+TOKEN = re.compile(r'\S+')
+
 
 class FragmentedToken:
-    def __init__(self, text: str, interpretations: List[List[str]]):
+    def __init__(self, text: str, interpretations: List[List[str]], start: int = 0, end: int = None, known: bool = True):
         self.text = text
         self.interpretations = interpretations
+        # character offsets of the token in the original text
+        self.start = start
+        self.end = start + len(text) if end is None else end
+        # whether the interpretations consist of tokens from the dictionary,
+        # otherwise no pattern could match this token
+        self.known = known
 
 
 class Tokenizer:
-    def __init__(self, dictionary: Set[str]):
+    def __init__(self, dictionary: Set[str], max_interpretations: int = 100):
+        """Create a tokenizer recognizing the tokens of a dictionary.
+
+        Arguments:
+            dictionary {Set[str]} -- Known tokens
+
+        Keyword Arguments:
+            max_interpretations {int} -- Maximum number of ways to subdivide
+                an unknown token, None for no limit (default: {100})
+        """
         # search for keys, case insensitively
         self.dictionary = {
             item.casefold(): item for item in dictionary
         }
+        self.max_interpretations = max_interpretations
+
+        # character trie of the keys for subdividing tokens
+        self.trie = cast(Dict[str, Any], {})
+        for key, item in self.dictionary.items():
+            self.__trie_add(key, item)
+
+        # indexes for expanding wildcards
+        self.key_order = {key: index for index,
+                          key in enumerate(self.dictionary)}
+        self.sorted_keys = sorted(self.dictionary)
+        self.sorted_reversed_keys = sorted(key[::-1] for key in self.dictionary)
+        self.character_keys = cast(Dict[str, Set[str]], {})
+        for key in self.dictionary:
+            for char in key:
+                self.character_keys.setdefault(char, set()).add(key)
+
+    def update(self, dictionary: Set[str]) -> None:
+        """Replace the known tokens, only the changed tokens
+        are updated in the indexes.
+
+        Arguments:
+            dictionary {Set[str]} -- The new known tokens
+        """
+        updated = {item.casefold(): item for item in dictionary}
+
+        for key in [key for key in self.dictionary if key not in updated]:
+            del self.dictionary[key]
+            self.__trie_remove(key)
+            del self.key_order[key]
+            del self.sorted_keys[bisect_left(self.sorted_keys, key)]
+            del self.sorted_reversed_keys[bisect_left(
+                self.sorted_reversed_keys, key[::-1])]
+            for char in set(key):
+                self.character_keys[char].discard(key)
+
+        next_order = max(self.key_order.values(), default=-1) + 1
+        for key, item in updated.items():
+            if key in self.dictionary:
+                if self.dictionary[key] != item:
+                    self.dictionary[key] = item
+                    self.__trie_add(key, item)
+                continue
+            self.dictionary[key] = item
+            self.__trie_add(key, item)
+            self.key_order[key] = next_order
+            next_order += 1
+            insort(self.sorted_keys, key)
+            insort(self.sorted_reversed_keys, key[::-1])
+            for char in key:
+                self.character_keys.setdefault(char, set()).add(key)
+
+    def contains_known(self, text: str) -> bool:
+        """Whether a text could contain a known token. If not, all its
+        tokens are unknown and there is no need to tokenize it.
+
+        Arguments:
+            text {str} -- The text to check
+
+        Returns:
+            bool -- Whether any token is a key of the dictionary, can be
+                divided into keys or contains a wildcard
+        """
+        for token in TOKEN.finditer(text):
+            item = token.group()
+            if '?' in item or '.' in item:
+                return True
+            key = item.casefold()
+            if key in self.dictionary or self.__divisible(key):
+                return True
+        return False
+
+    def __divisible(self, key: str) -> bool:
+        """Whether a text can be completely divided into keys, this is
+        the same as the text having a subdivision (but cheaper to check).
+        """
+        length = len(key)
+        # whether a division could continue from each character position
+        reachable = [True] + [False] * length
+        for start in range(0, length):
+            if not reachable[start]:
+                continue
+            node = self.trie
+            for end in range(start, length):
+                try:
+                    node = node[key[end]]
+                except KeyError:
+                    break
+                if TRIE_END in node:
+                    reachable[end + 1] = True
+        return reachable[length]
+
+    def __trie_add(self, key: str, item: str) -> None:
+        if not key:
+            return
+        node = self.trie
+        for char in key:
+            node = node.setdefault(char, {})
+        node[TRIE_END] = item
+
+    def __trie_remove(self, key: str) -> None:
+        if not key:
+            return
+        path = [self.trie]
+        for char in key:
+            path.append(path[-1][char])
+        del path[-1][TRIE_END]
+        # prune the nodes which no longer lead to any key
+        for index in range(len(key) - 1, -1, -1):
+            if path[index + 1]:
+                break
+            del path[index][key[index]]
 
-    # TODO: this should preserve whitespace
-    def tokenize(self, text: str) -> Iterable[FragmentedToken]:
-        splitted = text.split()
-        for item in splitted:
+    def tokenize(self, text: str, offset: int = 0) -> Iterable[FragmentedToken]:
+        """Split a text into tokens, which keep their position in the text
+
+        Arguments:
+            text {str} -- The text to tokenize
+
+        Keyword Arguments:
+            offset {int} -- Character offset of the text e.g. when it is
+                a part of a larger document (default: {0})
+
+        Yields:
+            Iterable[FragmentedToken] -- The (possibly ambiguous) tokens
+        """
+        for token in TOKEN.finditer(text):
+            item = token.group()
+            start = token.start() + offset
+            end = token.end() + offset
             if '?' in item or '.' in item:
                 # basic implementation, only supports wildcards and single tokens
-                test = re.compile(
-                    '^' + item.replace('?', '.').replace('.', '.*') + '$', re.IGNORECASE)
-                interpretations = []
-                for candidate in self.dictionary:
-                    if test.search(candidate):
-                        interpretations.append([candidate])
+                interpretations = [[candidate]
+                                   for candidate in self.expand(item)]
                 if interpretations:
-                    yield FragmentedToken(item, interpretations)
+                    yield FragmentedToken(item, interpretations, start, end)
             elif item.casefold() in self.dictionary:
                 # known text
-                yield FragmentedToken(item, [[self.dictionary[item.casefold()]]])
+                yield FragmentedToken(item, [[self.dictionary[item.casefold()]]], start, end)
             else:
                 # see if this token could be splitted into multiple
                 # tokens
                 interpretations = list(self.subdivide(item))
                 if interpretations:
-                    yield FragmentedToken(item, interpretations)
+                    yield FragmentedToken(item, interpretations, start, end)
                 else:
                     # yield the text as-is
-                    yield FragmentedToken(item, [[item]])
+                    yield FragmentedToken(item, [[item]], start, end, False)
+
+    def expand(self, item: str) -> List[str]:
+        """Get the known tokens matching a token with wildcards
+
+        Arguments:
+            item {str} -- Token with ? and/or . as wildcards, both match any
+                (possibly empty) text
+
+        Returns:
+            List[str] -- The matching (case folded) keys of the dictionary
+        """
+        test = wildcard_pattern(item)
+        segments = WILDCARDS.split(item.casefold())
+        if REGEX_CHARACTERS.intersection(item):
+            # the literal text isn't only literal, check everything
+            candidates = cast(Iterable[str], self.dictionary)
+        elif segments[0]:
+            candidates = self.__with_prefix(self.sorted_keys, segments[0])
+        elif segments[-1]:
+            candidates = (key[::-1] for key in self.__with_prefix(
+                self.sorted_reversed_keys, segments[-1][::-1]))
+        else:
+            characters = set(''.join(segments))
+            if characters:
+                # only check the keys containing the rarest character
+                rarest = min(
+                    (self.character_keys.get(char, set()) for char in characters),
+                    key=len)
+                candidates = rarest
+            else:
+                candidates = self.dictionary
+
+        return sorted((candidate for candidate in candidates if test.search(candidate)),
+                      key=self.key_order.__getitem__)
+
+    def __with_prefix(self, sorted_keys: List[str], prefix: str) -> Iterable[str]:
+        index = bisect_left(sorted_keys, prefix)
+        while index < len(sorted_keys) and sorted_keys[index].startswith(prefix):
+            yield sorted_keys[index]
+            index += 1
 
     def subdivide(self, item: str) -> Iterable[List[str]]:
         """Divide an unknown token into multiple known tokens, if possible
@@ -51,10 +252,42 @@ class Tokenizer:
         Yields:
             Iterable[List[str]] -- A list of tokens completely spanning the text
         """
-        for (casefold_candidate, candidate) in self.dictionary.items():
-            casefold_item = item.casefold()
-            if casefold_item == casefold_candidate:
-                yield [candidate]
-            elif casefold_item.startswith(casefold_candidate):
-                for additional in self.subdivide(casefold_item[len(casefold_candidate):]):
-                    yield [candidate] + additional
+        casefold_item = item.casefold()
+        length = len(casefold_item)
+
+        # lattice of the known tokens starting at each character position
+        edges = cast(List[List[Tuple[int, str]]], [])
+        for start in range(0, length):
+            start_edges = cast(List[Tuple[int, str]], [])
+            node = self.trie
+            for end in range(start, length):
+                try:
+                    node = node[casefold_item[end]]
+                except KeyError:
+                    break
+                if TRIE_END in node:
+                    start_edges.append((end + 1, node[TRIE_END]))
+            edges.append(start_edges)
+
+        # whether the remainder from a position can be completely divided
+        complete = [False] * length + [True]
+        for start in range(length - 1, -1, -1):
+            complete[start] = any(complete[end] for end, _ in edges[start])
+
+        if not length or not complete[0]:
+            return
+
+        # walk all the complete paths through the lattice
+        count = 0
+        stack = [(0, cast(List[str], []))]
+        while stack:
+            start, tokens = stack.pop()
+            if start == length:
+                yield tokens
+                count += 1
+                if self.max_interpretations is not None and count >= self.max_interpretations:
+                    return
+                continue
+            for end, candidate in reversed(edges[start]):
+                if complete[end]:
+                    stack.append((end, tokens + [candidate]))
@@ -1,11 +1,21 @@
 #!/usr/bin/env python3
-from .dict import dict_value
-from .numeral import numeral_value
+from typing import Any, Callable, Dict
+
+from .dict import compile_dict, dict_value
+from .numeral import compile_numeral, numeral_value
 from .text import text_value
 
 
-values = {
+values: Dict[str, Callable[[str], Any]] = {
     'dict': dict_value,
     'numeral': numeral_value,
     'text': text_value
 }
+
+# compilers of value templates, a compiled template evaluates a match
+# directly from the values bound to its slots (instead of its filled
+# template string)
+templates = {
+    'dict': compile_dict,
+    'numeral': compile_numeral
+}
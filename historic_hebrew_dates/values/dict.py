@@ -1,9 +1,100 @@
-﻿#!/usr/bin/env python3
-import yaml
-from typing import Dict
+#!/usr/bin/env python3
+import re
+from functools import lru_cache
+from typing import cast, Any, Dict, List, Optional, Tuple
+
+SLOT = re.compile(r'(?P<quote>[\'"]?)\{(?P<name>[^{}]*)\}(?P=quote)')
+PLACEHOLDER = '__slot_{}__'
 
 
 def dict_value(expression: str) -> Dict:
+    import yaml
     values: Dict[str, str] = yaml.safe_load('{' + expression[1:-1] + '}')
 
     return values
+
+
+class DictTemplate:
+    def __init__(self, template: str):
+        """Compile a dict template, e.g. [type: '{type}', year: {year}]
+
+        Arguments:
+            template {str} -- Template with slots for the bound values
+
+        Raises:
+            ValueError -- The slots aren't complete values of the dict
+        """
+        import yaml
+
+        slots = cast(List[Tuple[str, bool]], [])
+
+        def placeholder(match) -> str:
+            slots.append((match.group('name'), bool(match.group('quote'))))
+            return PLACEHOLDER.format(len(slots) - 1)
+
+        try:
+            parsed = dict_value(SLOT.sub(placeholder, template))
+        except yaml.YAMLError:
+            raise ValueError(f'Invalid template: {template}')
+        if not isinstance(parsed, dict):
+            raise ValueError(f'Invalid template: {template}')
+
+        placeholders = {PLACEHOLDER.format(index): slot
+                        for index, slot in enumerate(slots)}
+        self.constants = cast(Dict[Any, Any], {})
+        # key -> name of the slot and whether its value is quoted
+        self.slots = cast(Dict[Any, Tuple[str, bool]], {})
+        for key, value in parsed.items():
+            if isinstance(value, str) and value in placeholders:
+                self.slots[key] = placeholders[value]
+            elif '__slot_' in repr(key) + repr(value):
+                # a slot is only part of a value
+                raise ValueError(f'Unsupported template: {template}')
+            else:
+                self.constants[key] = value
+        self.keys = list(parsed.keys())
+
+    def evaluate(self, bindings: Dict[str, Any]) -> Dict[Any, Any]:
+        """Construct the dict from the values bound to its slots.
+
+        Arguments:
+            bindings {Dict[str, Any]} -- The evaluated values of child matches
+
+        Raises:
+            ValueError -- A slot isn't bound
+
+        Returns:
+            Dict[Any, Any] -- The evaluated value
+        """
+        values = cast(Dict[Any, Any], {})
+        for key in self.keys:
+            if key in self.slots:
+                name, quoted = self.slots[key]
+                try:
+                    value = bindings[name]
+                except KeyError:
+                    raise ValueError(f'Unbound slot: {name}')
+                values[key] = str(value) if quoted else value
+            else:
+                values[key] = self.constants[key]
+        return values
+
+    def value(self, result: Dict[Any, Any]) -> Dict[Any, Any]:
+        return result
+
+
+@lru_cache(maxsize=None)
+def compile_dict(template: str) -> Optional[DictTemplate]:
+    """Compile a dict template.
+
+    Arguments:
+        template {str} -- Template with slots for the bound values
+
+    Returns:
+        Optional[DictTemplate] -- The compiled template, None if the template
+            can only be evaluated by filling it in
+    """
+    try:
+        return DictTemplate(template)
+    except ValueError:
+        return None
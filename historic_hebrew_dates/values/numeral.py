@@ -1,11 +1,328 @@
 #!/usr/bin/env python3
 import math
+import re
 
-from typing import cast, Union
+from functools import lru_cache
+from typing import cast, Any, Dict, List, NamedTuple, Optional, Tuple, Union
 
+Number = Union[int, float]
 
+# precedence of the outermost operator of an expression, an
+# expression can only be substituted within another expression
+# without parentheses if its precedence is high enough
+SUM = 1
+PRODUCT = 2
+UNARY = 3
+ATOM = 4
+
+TOKENS = re.compile(
+    r'\s*(?:(?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)|\{(?P<slot>[^{}]*)\}|(?P<operator>[-+*/()]))')
+
+# maximum number of memoized evaluations of a template
+CACHE_SIZE = 1024
+
+
+class NumeralResult(NamedTuple):
+    """Value of a numeral match, with the precedence of the expression
+    it was evaluated from.
+    """
+    value: Number
+    precedence: int
+
+
+class Node:
+    """Node of an expression tree.
+    """
+
+    def evaluate(self, values: Dict[str, Number]) -> Number:
+        raise NotImplementedError
+
+
+class Constant(Node):
+    def __init__(self, value: Number):
+        self.value = value
+
+    def evaluate(self, values: Dict[str, Number]) -> Number:
+        return self.value
+
+
+class Slot(Node):
+    def __init__(self, name: str):
+        self.name = name
+        # the minimal precedence of the substituted expression
+        self.required = 0
+
+    def evaluate(self, values: Dict[str, Number]) -> Number:
+        return values[self.name]
+
+
+class Group(Node):
+    def __init__(self, expression: Node):
+        self.expression = expression
+
+    def evaluate(self, values: Dict[str, Number]) -> Number:
+        return self.expression.evaluate(values)
+
+
+class Negation(Node):
+    def __init__(self, operator: str, operand: Node):
+        self.operator = operator
+        self.operand = operand
+
+    def evaluate(self, values: Dict[str, Number]) -> Number:
+        value = self.operand.evaluate(values)
+        return -value if self.operator == '-' else +value
+
+
+class Operation(Node):
+    def __init__(self, operator: str, left: Node, right: Node):
+        self.operator = operator
+        self.left = left
+        self.right = right
+
+    def evaluate(self, values: Dict[str, Number]) -> Number:
+        left = self.left.evaluate(values)
+        right = self.right.evaluate(values)
+        if self.operator == '+':
+            return left + right
+        elif self.operator == '-':
+            return left - right
+        elif self.operator == '*':
+            return left * right
+        else:
+            return left / right
+
+
+OPERATORS = {
+    '+': SUM,
+    '-': SUM,
+    '*': PRODUCT,
+    '/': PRODUCT
+}
+
+
+class ExpressionParser:
+    """Recursive descent parser for arithmetic expressions:
+    numbers, + - * / and parentheses. Nothing else is accepted.
+    """
+
+    def __init__(self, expression: str, slots: bool):
+        self.tokens = cast(List[Tuple[str, str]], [])
+        position = 0
+        expression = expression.rstrip()
+        while position < len(expression):
+            match = TOKENS.match(expression, position)
+            if not match or (match.group('slot') is not None and not slots):
+                raise ValueError(f'Invalid expression: {expression}')
+            kind = cast(str, match.lastgroup)
+            self.tokens.append((kind, match.group(kind)))
+            position = match.end()
+        self.index = 0
+
+    def parse(self) -> Tuple[Node, Optional[int]]:
+        """Parse the complete expression.
+
+        Returns:
+            Tuple[Node, Optional[int]] -- The expression tree and its precedence,
+                None if the expression is only a slot
+        """
+        node, precedence = self.__expression()
+        if self.index != len(self.tokens):
+            raise ValueError('Unexpected token')
+        return node, precedence
+
+    def __peek(self) -> Tuple[str, str]:
+        try:
+            return self.tokens[self.index]
+        except IndexError:
+            return ('end', '')
+
+    def __expression(self) -> Tuple[Node, Optional[int]]:
+        return self.__binary(SUM)
+
+    def __binary(self, level: int) -> Tuple[Node, Optional[int]]:
+        node, precedence = self.__binary(level + 1) if level < PRODUCT else self.__unary()
+        while True:
+            kind, value = self.__peek()
+            if kind != 'operator' or OPERATORS.get(value) != level:
+                return node, precedence
+            self.index += 1
+            right, _ = self.__binary(level + 1) if level < PRODUCT else self.__unary()
+            node, precedence = Operation(value, node, right), level
+
+    def __unary(self) -> Tuple[Node, Optional[int]]:
+        kind, value = self.__peek()
+        if kind == 'operator' and value in '+-':
+            self.index += 1
+            operand, _ = self.__unary()
+            return Negation(value, operand), UNARY
+        return self.__atom()
+
+    def __atom(self) -> Tuple[Node, Optional[int]]:
+        kind, value = self.__peek()
+        self.index += 1
+        if kind == 'number':
+            return Constant(parse_number(value)), ATOM
+        elif kind == 'slot':
+            return Slot(value), None
+        elif kind == 'operator' and value == '(':
+            node, _ = self.__expression()
+            if self.__peek() != ('operator', ')'):
+                raise ValueError('Expected )')
+            self.index += 1
+            return Group(node), ATOM
+        raise ValueError('Unexpected token')
+
+
+def parse_number(text: str) -> Number:
+    if any(char in text for char in '.eE'):
+        return float(text)
+    if text[0] == '0' and text.strip('0'):
+        # same as Python: no leading zeros for integers
+        raise ValueError(f'Invalid number: {text}')
+    return int(text)
+
+
+def prepare(node: Node, required: int, slots: List[Slot]) -> Node:
+    """Determine the precedence required for each slot and fold constants.
+
+    Arguments:
+        node {Node} -- Expression tree
+        required {int} -- Precedence required for this node
+        slots {List[Slot]} -- Found slots are added to this list
+
+    Returns:
+        Node -- The (folded) node
+    """
+    if isinstance(node, Slot):
+        node.required = required
+        slots.append(node)
+        return node
+    elif isinstance(node, Group):
+        node.expression = prepare(node.expression, 0, slots)
+        if isinstance(node.expression, Constant):
+            return node.expression
+        return node
+    elif isinstance(node, Negation):
+        node.operand = prepare(node.operand, UNARY, slots)
+        if isinstance(node.operand, Constant):
+            return Constant(node.evaluate({}))
+        return node
+    elif isinstance(node, Operation):
+        level = OPERATORS[node.operator]
+        node.left = prepare(node.left, level, slots)
+        node.right = prepare(node.right, level + 1, slots)
+        if isinstance(node.left, Constant) and isinstance(node.right, Constant):
+            try:
+                return Constant(node.evaluate({}))
+            except ArithmeticError:
+                return Constant(math.nan)
+        return node
+    return node
+
+
+class NumeralTemplate:
+    def __init__(self, template: str):
+        """Compile a numeral template, e.g. {a}*10+{b}
+
+        Arguments:
+            template {str} -- Template with slots for the bound values
+
+        Raises:
+            ValueError -- The template isn't an arithmetic expression
+        """
+        tree, self.precedence = ExpressionParser(template, True).parse()
+        self.slots = cast(List[Slot], [])
+        self.tree = prepare(tree, 0, self.slots)
+        self.names = sorted(set(slot.name for slot in self.slots))
+        self.cache = cast(Dict[Tuple[NumeralResult, ...], NumeralResult], {})
+
+    def evaluate(self, bindings: Dict[str, Any]) -> NumeralResult:
+        """Evaluate the template using the values bound to its slots.
+
+        Arguments:
+            bindings {Dict[str, Any]} -- The evaluated values of child
+                matches, or the results of other numeral templates
+
+        Raises:
+            ValueError -- The bindings can't be evaluated as part of this
+                template and the filled template should be evaluated instead
+
+        Returns:
+            NumeralResult -- The value and its precedence
+        """
+        try:
+            key = tuple(numeral_result(bindings[name]) for name in self.names)
+        except KeyError:
+            raise ValueError('Unbound slot')
+
+        try:
+            return self.cache[key]
+        except KeyError:
+            pass
+
+        results = dict(zip(self.names, key))
+        for slot in self.slots:
+            if results[slot.name].precedence < slot.required:
+                # the filled template would be parsed differently
+                raise ValueError('Ambiguous substitution')
+
+        try:
+            value = self.tree.evaluate(
+                {name: result.value for name, result in results.items()})
+        except ArithmeticError:
+            value = math.nan
+
+        if self.precedence is None:
+            result = NumeralResult(value, results[cast(Slot, self.tree).name].precedence)
+        else:
+            result = NumeralResult(value, self.precedence)
+
+        if len(self.cache) >= CACHE_SIZE:
+            self.cache.clear()
+        self.cache[key] = result
+        return result
+
+    def value(self, result: NumeralResult) -> Number:
+        return result.value
+
+
+def numeral_result(value: Any) -> NumeralResult:
+    """Get the result for a value, as if it was written in the template.
+    """
+    if isinstance(value, NumeralResult):
+        return value
+    if type(value) not in (int, float):
+        raise ValueError('Not a number')
+    if not math.isfinite(value):
+        # isn't written as a number
+        return NumeralResult(math.nan, ATOM)
+    return NumeralResult(value, UNARY if math.copysign(1, value) < 0 else ATOM)
+
+
+@lru_cache(maxsize=None)
+def compile_numeral(template: str) -> Optional[NumeralTemplate]:
+    """Compile a numeral template.
+
+    Arguments:
+        template {str} -- Template with slots for the bound values
+
+    Returns:
+        Optional[NumeralTemplate] -- The compiled template, None if the template
+            can't be evaluated as an expression (e.g. when slots are concatenated,
+            or it is nested too deeply)
+    """
+    try:
+        return NumeralTemplate(template)
+    except (ValueError, RecursionError):
+        return None
+
+
+@lru_cache(maxsize=4096)
 def numeral_value(expression: str) -> Union[int, float]:
     try:
-        return cast(int, eval(expression, {}, {}))
-    except Exception as error:
+        node, _ = ExpressionParser(expression, False).parse()
+        return node.evaluate({})
+    except (ValueError, ArithmeticError, RecursionError):
+        # not an expression, or nested too deeply to parse
         return math.nan
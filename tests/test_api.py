@@ -0,0 +1,61 @@
+"""
+Unit test for the API of the editor.
+"""
+
+import os
+import unittest
+from importlib.util import find_spec
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@unittest.skipUnless(find_spec('flask'), 'requires flask')
+class TestApi(unittest.TestCase):
+    """
+    Unit test class.
+    """
+
+    def setUp(self):
+        # the API uses paths relative to the root of the repository
+        self.cwd = os.getcwd()
+        os.chdir(ROOT)
+        from api.app import app
+        self.client = app.test_client()
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+
+    def test_save_pattern(self):
+        from api.app import base_parsers, cached_parser
+
+        path = os.path.join('historic_hebrew_dates', 'patterns', 'dutch_numerals.csv')
+        with open(path, 'rb') as original:
+            content = original.read()
+
+        # the editor sends the rows without the header
+        dates = self.client.get('/api/patterns/dutch/dates').get_json()[1:]
+
+        def search():
+            result = self.client.post('/api/search/dutch/dates', json={
+                'input': 'op zilch mei',
+                'rows': dates
+            }).get_json()
+            self.assertFalse(result['error'])
+            return [match['type']
+                    for part in result['result'] for match in part.get('matches', [])]
+
+        try:
+            self.assertEqual(search(), ['maand'])
+
+            numerals = self.client.get('/api/patterns/dutch/numerals').get_json()
+            self.client.put('/api/patterns/dutch/numerals', json={
+                'rows': numerals + [['digit', 'zilch', '31']]
+            })
+
+            # the other types use the saved numerals
+            self.assertEqual(search(), ['zonder_jaar'])
+        finally:
+            with open(path, 'wb') as restored:
+                restored.write(content)
+            cached_parser.cache_clear()
+            base_parsers.cache_clear()
@@ -0,0 +1,109 @@
+"""
+Unit test for searching many texts in parallel.
+"""
+
+import csv
+import io
+import json
+import math
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stderr, redirect_stdout
+from unittest.mock import patch
+
+from historic_hebrew_dates import create_parsers, search_many
+from historic_hebrew_dates.__main__ import json_value, main
+from historic_hebrew_dates.parser_cache import CACHE_VARIABLE
+
+
+class TestBatch(unittest.TestCase):
+    """
+    Unit test class.
+    """
+
+    def test_search_many(self):
+        with open(os.path.join(os.path.dirname(__file__), 'hebrew_numerals.csv'), encoding='utf8') as numerals:
+            texts = [row[0] for row in csv.reader(numerals)]
+
+        parser = create_parsers('hebrew')['numerals']
+        expected = [parser.search(text) for text in texts]
+
+        with tempfile.TemporaryDirectory() as directory, \
+                patch.dict(os.environ, {CACHE_VARIABLE: directory}):
+            self.assertListEqual(search_many(
+                texts, 'hebrew', 'numerals', workers=2, chunksize=3), expected)
+            self.assertListEqual(search_many(
+                texts, 'hebrew', 'numerals', workers=1), expected)
+
+    def test_batch_command(self):
+        texts = ['in het jaar negentienhonderd', 'niets', 'op drie mei']
+        parser = create_parsers('dutch')['dates']
+        expected = [[(match['start'], match['end'], match['eval'])
+                     for part in parser.search(text) for match in part.get('matches', [])]
+                    for text in texts]
+
+        with tempfile.TemporaryDirectory() as directory, \
+                patch.dict(os.environ, {CACHE_VARIABLE: directory}):
+            inputs = {
+                'texts.txt': '\n'.join(texts) + '\n',
+                'texts.csv': 'id,text\n' + ''.join(f'{i},{text}\n' for i, text in enumerate(texts)),
+                'texts.jsonl': ''.join(json.dumps({'text': text}) + '\n' for text in texts)
+            }
+            for filename, content in inputs.items():
+                path = os.path.join(directory, filename)
+                with open(path, 'w', encoding='utf-8') as output:
+                    output.write(content)
+
+                for workers in ['1', '2']:
+                    stdout = io.StringIO()
+                    stderr = io.StringIO()
+                    args = ['batch', '--lang', 'dutch', '--workers', workers, path]
+                    if filename.endswith('.csv'):
+                        args += ['--column', 'text']
+                    with redirect_stdout(stdout), redirect_stderr(stderr):
+                        main(args)
+
+                    records = [json.loads(line) for line in stdout.getvalue().splitlines()]
+                    self.assertEqual([record['text'] for record in records], texts)
+                    self.assertEqual([[(match['start'], match['end'], match['eval'])
+                                       for match in record['matches']]
+                                      for record in records], expected)
+                    self.assertIn('3 texts', stderr.getvalue())
+
+    def test_batch_stdin(self):
+        stdin = io.TextIOWrapper(io.BytesIO('één mei\n'.encode('latin-1')))
+        stdout = io.StringIO()
+        with tempfile.TemporaryDirectory() as directory, \
+                patch.dict(os.environ, {CACHE_VARIABLE: directory}), \
+                patch('sys.stdin', stdin), \
+                redirect_stdout(stdout), redirect_stderr(io.StringIO()):
+            main(['batch', '--lang', 'dutch', '--workers', '1', '--encoding', 'latin-1'])
+
+        record = json.loads(stdout.getvalue())
+        self.assertEqual(record['text'], 'één mei')
+        self.assertEqual(record['matches'][0]['eval'], {'dag': '1', 'maand': 5})
+
+    def test_batch_invalid_jsonl(self):
+        lines = ['{"text": "op drie mei"}', '{"text": "op drie', '{"id": 1}',
+                 '["text"]', '{"text": 3}', '{"text": "op vier mei"}']
+        stdin = io.TextIOWrapper(io.BytesIO('\n'.join(lines).encode('utf-8')))
+        stdout = io.StringIO()
+        stderr = io.StringIO()
+        with tempfile.TemporaryDirectory() as directory, \
+                patch.dict(os.environ, {CACHE_VARIABLE: directory}), \
+                patch('sys.stdin', stdin), \
+                redirect_stdout(stdout), redirect_stderr(stderr):
+            main(['batch', '--lang', 'dutch', '--workers', '1', '--format', 'jsonl'])
+
+        # the invalid records are reported and skipped
+        records = [json.loads(line) for line in stdout.getvalue().splitlines()]
+        self.assertEqual([(record['line'], record['text']) for record in records],
+                         [(1, 'op drie mei'), (6, 'op vier mei')])
+        for line in range(2, 6):
+            self.assertIn(f'-:{line}: skipped', stderr.getvalue())
+
+    def test_json_value(self):
+        value = json_value({'eval': [math.nan, {'year': math.inf}, 1.5], 'text': 'nan'})
+        self.assertEqual(value, {'eval': [None, {'year': None}, 1.5], 'text': 'nan'})
+        json.dumps(value, allow_nan=False)
@@ -0,0 +1,209 @@
+"""
+Unit test for the different ways of running the chart parser.
+"""
+
+import csv
+import os
+import unittest
+from random import Random
+from unittest.mock import patch
+
+from historic_hebrew_dates import create_parsers
+from historic_hebrew_dates.chart_parser import ChartParser
+from historic_hebrew_dates.pattern_matcher import PatternMatcher, PatternMatcherState, PatternNode, TokenPart, TokenSpan, TypePart, token_key, type_key
+from historic_hebrew_dates.pattern_parser import PatternParser
+
+
+def read_texts(lang):
+    texts = []
+    directory = os.path.dirname(__file__)
+    for filename in sorted(os.listdir(directory)):
+        if filename.startswith(lang) and filename.endswith('.csv'):
+            with open(os.path.join(directory, filename), encoding='utf-8-sig') as rows:
+                texts += [row[0] for row in csv.reader(rows) if row]
+    return texts
+
+
+def summarize(matches):
+    return [sorted((match.value, match.type, match.text, match.last, match.is_captured)
+                   for match in token_matches)
+            for token_matches in matches]
+
+
+def positions(matches):
+    return [[(match.start, match.interpretation_index, match.subtoken_index,
+              match.last, match.last_interpretation_index, match.last_subtoken_index,
+              match.type, match.value, match.text)
+             for match in token_matches]
+            for token_matches in matches]
+
+
+def matcher_major(parser):
+    while parser.iterate():
+        pass
+
+
+class TestChartParser(unittest.TestCase):
+    """
+    Unit test class.
+    """
+
+    def test_compiled(self):
+        for lang in ['hebrew', 'dutch']:
+            compiled = create_parsers(lang)
+            uncompiled = create_parsers(lang, compiled=False)
+            for text in read_texts(lang):
+                for name, parser in compiled.items():
+                    self.assertEqual(
+                        summarize(parser.parse(
+                            text, omit_captured=False, hide_overlap=False)),
+                        summarize(uncompiled[name].parse(
+                            text, omit_captured=False, hide_overlap=False)),
+                        f'{name}: {text}')
+
+    def test_schedule(self):
+        random = Random(0)
+        for lang in ['hebrew', 'dutch']:
+            parsers = create_parsers(lang)
+            texts = read_texts(lang)
+            texts += [' '.join(random.sample(texts, 5)) for _ in range(20)]
+            for text in texts:
+                for name, parser in parsers.items():
+                    token_major = positions(parser.parse(
+                        text, omit_captured=False, hide_overlap=False, eval_values=False))
+                    with patch.object(ChartParser, 'process_all', matcher_major):
+                        self.assertEqual(
+                            token_major,
+                            positions(parser.parse(
+                                text, omit_captured=False, hide_overlap=False, eval_values=False)),
+                            f'{name}: {text}')
+
+    def test_schedule_order(self):
+        # the later types use the matches of the preceding types, spanning
+        # multiple tokens: these are still found in the same order as
+        # when each matcher was applied to all the tokens in turn
+        rows = [['ta', 'a', '(1)'],
+                ['ta', 'a b', '(2)'],
+                ['tb', '{x:ta} {y:ta}', '({x}+{y})'],
+                ['tb', 'b', '(5)'],
+                ['tc', '{1} {2}', '({1}*{2})']]
+        expected = [(0, '(1)')] + [(1, '(2)')] * 2 + [(2, '((2)+(1))')] * 2 + \
+            [(3, '((2)+(2))')] * 4 + [(1, '((1)*(5))')] + [(2, '((2)*(1))')] * 2 + \
+            [(3, '((2)*(2))')] * 4 + [(4, '((2)*((2)+(1)))')] * 4 + \
+            [(3, '(((2)+(1))*(5))')] * 2 + [(4, '(((2)+(2))*(1))')] * 4
+
+        parser = PatternParser(None, 'tc', eval, rows=rows)
+        for process_all in [ChartParser.process_all, matcher_major]:
+            with patch.object(ChartParser, 'process_all', process_all):
+                [first, *_] = parser.parse(
+                    'a b a b a', omit_captured=False, hide_overlap=False, eval_values=False)
+                self.assertListEqual(
+                    [(match.last, match.value) for match in first], expected)
+
+    def test_order(self):
+        # the first of the equal matches is shown, so these should be found
+        # in the same order as before the parser was optimized
+        rows = [['ta', 'a', '(9)'],
+                ['ta', 'a a', '(7)'],
+                ['tb', '{x0:ta} {x1:ta} {3}', '({x0}+{x1}+{3}+3)']]
+        for compiled in [True, False]:
+            parser = PatternParser(None, 'tb', eval, rows=rows, compiled=compiled)
+            [first, *_] = parser.parse(
+                'a a a a', omit_captured=False, hide_overlap=False, eval_values=False)
+            self.assertListEqual(
+                [(match.last, match.value) for match in first],
+                [(0, '(9)')] + [(1, '(7)')] * 4 + [(2, '((9)+(9)+(9)+3)')] +
+                [(3, '((9)+(9)+(7)+3)')] * 4 +
+                [(3, '((7)+(9)+(9)+3)')] * 4 +
+                [(3, '((9)+(7)+(9)+3)')] * 4)
+
+        # the matchers of a trie find their matches together, these
+        # are still listed in the order of the rows
+        rows = [['ta', 'c', '(2)'], ['ta', '{1} b', '({1}+6)'], ['ta', 'c', '(9)']]
+        for compiled in [True, False]:
+            parser = PatternParser(None, 'ta', eval, rows=rows, compiled=compiled)
+            [first, *_] = parser.parse(
+                'c b', omit_captured=False, hide_overlap=False, eval_values=False)
+            self.assertListEqual(
+                [match.value for match in first],
+                ['(2)', '((2)+6)', '(9)', '(9)'])
+
+    def test_prefilter(self):
+        random = Random(0)
+        unknown = ['xyz', 'Lorem', '$', '(', '12']
+        for lang in ['hebrew', 'dutch']:
+            parsers = create_parsers(lang)
+            texts = read_texts(lang)
+            # separate the known tokens by unknown words
+            texts += [' '.join(random.sample(texts + unknown, 5)) for _ in range(20)]
+            texts += [' '.join(unknown), '  ', '', ' xyz  Lorem\n']
+            for text in texts:
+                for name, parser in parsers.items():
+                    self.assertEqual(
+                        parser.search(text),
+                        parser.search(text, prefilter=False),
+                        f'{name}: {text}')
+
+    def test_hide_overlap(self):
+        random = Random(0)
+        for lang in ['hebrew', 'dutch']:
+            parsers = create_parsers(lang)
+            texts = read_texts(lang)
+            # (randomly) combined texts give more overlapping matches
+            texts += [' '.join(random.sample(texts, 5)) for _ in range(20)]
+            for text in texts:
+                for name, parser in parsers.items():
+                    for omit_captured in [True, False]:
+                        self.assertEqual(
+                            positions(parser.parse(
+                                text, omit_captured=omit_captured, eval_values=False)),
+                            positions(parser.parse(
+                                text, omit_captured=omit_captured, eval_values=False, overlap_method='pairwise')),
+                            f'{name}: {text}')
+
+    def test_fill(self):
+        matcher = PatternMatcher('number', '({a}*{a}+{b}) {{c}}', [])
+        span = TokenSpan(0, 0, 1, 0, 0, 0, 1, 0, 'number', ['x'], '(1+2)')
+        self.assertEqual(matcher.fill({'a': span}), '((1+2)*(1+2)+{b}) {{c}}')
+
+    def test_span_tokens(self):
+        first = TokenSpan(0, 0, 2, 0, 0, 0, 2, 1, 'number', ('a', 'b'))
+        second = TokenSpan(1, 0, 1, 0, 1, 0, 1, 0, None, ('c',))
+        span = TokenSpan(0, 0, 2, 0, 1, 0, 1, 0, 'date', (first, second))
+        self.assertEqual(span.len, 3)
+        self.assertEqual(span.text, 'a b c')
+        self.assertListEqual(span.tokens, ['a', 'b', 'c'])
+        self.assertFalse(hasattr(span, '__dict__'))
+
+    def test_release_bindings(self):
+        parser = create_parsers('hebrew')['numerals']
+        [[match, *_], *_] = parser.parse('שבע מאות וחמישים')
+        self.assertListEqual(sorted(match.bindings.keys()), ['1', '2'])
+        self.assertEqual(match.evaluated, 750)
+        # the bound spans are released once the value is evaluated
+        self.assertIsNone(match.state)
+        self.assertDictEqual(match.bindings, {})
+
+    def test_state(self):
+        root = PatternNode()
+        root.add(PatternMatcher('number', '{a}*{b}', [
+            TypePart('digit', 'a'), TokenPart('times'), TypePart('digit', 'b')]))
+        first = TokenSpan(0, 0, 1, 0, 0, 0, 1, 0, 'digit', ('two',), '2')
+        second = TokenSpan(1, 0, 1, 0, 1, 0, 1, 0, None, ('times',))
+        third = TokenSpan(2, 0, 1, 0, 2, 0, 1, 0, 'digit', ('three',), '3')
+
+        state = PatternMatcherState(root)
+        [after_first] = state.next(first, type_key('digit'))
+        [after_second] = after_first.next(second, token_key('times'))
+        [after_third] = after_second.next(third, type_key('digit'))
+
+        # continuing doesn't change the preceding states
+        self.assertIs(after_third.parent, after_second)
+        self.assertListEqual(after_first.spans, [first])
+        self.assertListEqual(after_third.spans, [first, second, third])
+        self.assertDictEqual(after_third.bindings, {'a': first, 'b': third})
+
+        [match] = after_third.emit()
+        self.assertEqual(match.value, '2*3')
+        self.assertEqual(match.text, 'two times three')
+        self.assertTrue(first.is_captured)
@@ -6,8 +6,10 @@ import csv
 import os
 import unittest
 import yaml
+from unittest.mock import Mock, patch
 
 from historic_hebrew_dates import create_parsers
+from historic_hebrew_dates.pattern_parser import MAX_PENDING
 
 class TestDates(unittest.TestCase):
     """
@@ -48,3 +50,91 @@ class TestDates(unittest.TestCase):
 
         test_lang('dutch', 'dutch_dates.csv')
         test_lang('hebrew', 'hebrew_dates.csv')
+
+    def test_shared_dependencies(self):
+        parsers = create_parsers('english')
+        numerals = parsers['numerals']
+        numerals.parse = Mock(wraps=numerals.parse)
+
+        parsers['dates'].search('March 3rd, 1999')
+        # used by the dates, ordinals and months
+        self.assertEqual(numerals.parse.call_count, 1)
+
+    def test_base_parsers(self):
+        base_parsers = create_parsers('hebrew')
+        rows = [['מספר', 'אחד', '1'], ['מספר', 'שתים', '2']]
+        parsers = create_parsers(
+            'hebrew', {'numerals': rows}, base_parsers=base_parsers)
+        expected = create_parsers('hebrew', {'numerals': rows})
+
+        # only the overridden type and its dependents are created
+        self.assertIs(parsers['date_types'], base_parsers['date_types'])
+        for name in ['numerals', 'months', 'dates']:
+            self.assertIsNot(parsers[name], base_parsers[name])
+
+        text = 'שנת אחד לחדש שתים'
+        self.assertListEqual(parsers['dates'].search(text),
+                             expected['dates'].search(text))
+
+    def test_lazy_evaluation(self):
+        parser = create_parsers('hebrew')['date_types']
+        parser.eval = Mock(side_effect=parser.eval)
+        matches = [match for token_matches in parser.parse('לחרבן הבית') for match in token_matches]
+        self.assertTrue(matches)
+        parser.eval.assert_not_called()
+
+        matches[0].evaluated
+        matches[0].evaluated
+        parser.eval.assert_called_once_with(matches[0].value)
+
+    def test_offsets(self):
+        parser = create_parsers('hebrew')['dates']
+        text = 'נפטרה  בשנת שבע מאות\nוחמישים לחרבן בית המקדש הקדוש  זכרונה לברכה'
+        [before, date, after] = parser.search(text)
+        self.assertEqual(before['text'], 'נפטרה')
+        self.assertEqual(date['text'], text[date['start']:date['end']])
+        match = date['matches'][0]
+        self.assertEqual(
+            text[match['start']:match['end']],
+            'בשנת שבע מאות\nוחמישים לחרבן בית המקדש הקדוש')
+        self.assertEqual(after['text'], 'זכרונה לברכה')
+
+    def test_search_stream(self):
+        parser = create_parsers('hebrew')['dates']
+        with open(os.path.join(os.path.dirname(__file__), 'hebrew_dates.csv'), encoding='utf-8-sig') as dates:
+            text = '\n'.join([f'{row[0]} פה נקבר' for row in csv.reader(dates)] * 4)
+
+        def without_interpretation(match):
+            # search() omits this when it is the same as the text
+            return {key: value for key, value in match.items() if key != 'interpretation'}
+
+        expected = [without_interpretation(match)
+                    for item in parser.search(text)
+                    for match in item.get('matches', [])]
+        self.assertGreater(len(expected), 10)
+
+        # split within the words
+        chunks = [text[i:i + 7] for i in range(0, len(text), 7)]
+        streamed = list(parser.search_stream(chunks, window=100))
+        self.assertListEqual(
+            [without_interpretation(match) for match in streamed], expected)
+        for match in streamed:
+            self.assertTrue(text[match['start']:match['end']])
+
+    def test_search_stream_pending(self):
+        parser = create_parsers('hebrew')['dates']
+        tokenize = parser.tokenizer.tokenize
+        lengths = []
+
+        def tokenize_length(text, offset=0):
+            lengths.append(len(text))
+            return tokenize(text, offset)
+
+        # without any whitespace the text is still tokenized piece by piece
+        chunks = ['x' * 1000] * 100 + [' שנת ארבע מאות ועשרים לחרבן הבית']
+        with patch.object(parser.tokenizer, 'tokenize', tokenize_length):
+            streamed = list(parser.search_stream(chunks))
+        self.assertLessEqual(max(lengths), MAX_PENDING + 1000)
+        text = ''.join(chunks)
+        self.assertIn('ארבע מאות ועשרים',
+                      [text[match['start']:match['end']] for match in streamed])
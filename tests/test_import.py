@@ -0,0 +1,61 @@
+"""
+Unit test for importing the package.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+from historic_hebrew_dates.parser_cache import CACHE_VARIABLE
+
+# generous, a plain import takes less than a tenth of this
+IMPORT_BUDGET = 1.0
+
+PACKAGE_PATH = os.path.join(os.path.dirname(
+    os.path.dirname(__file__)), 'historic_hebrew_dates')
+
+
+def run_python(code: str, *args: str) -> str:
+    return subprocess.run(
+        [sys.executable, '-c', code, *args],
+        check=True,
+        stdout=subprocess.PIPE,
+        env={**os.environ, CACHE_VARIABLE: ''},
+        cwd=os.path.dirname(PACKAGE_PATH)).stdout.decode('utf-8')
+
+
+def package_files():
+    return sorted(os.path.join(directory, filename)
+                  for directory, _, filenames in os.walk(PACKAGE_PATH)
+                  for filename in filenames
+                  if '__pycache__' not in directory)
+
+
+class TestImport(unittest.TestCase):
+    """
+    Unit test class.
+    """
+
+    def test_import(self):
+        result = json.loads(run_python('''
+import json, sys, time
+start = time.perf_counter()
+import historic_hebrew_dates
+duration = time.perf_counter() - start
+print(json.dumps({'duration': duration, 'modules': list(sys.modules)}))'''))
+
+        self.assertLess(result['duration'], IMPORT_BUDGET)
+        for module in ['pandas', 'bidi', 'ply', 'yaml', 'multiprocessing']:
+            self.assertNotIn(module, result['modules'])
+
+    def test_no_writes(self):
+        files = package_files()
+        output = run_python('''
+import sys
+from historic_hebrew_dates.__main__ import main
+main(sys.argv[1:])''', 'שבע', 'מאות', 'וחמישים', 'וארבע')
+
+        self.assertEqual(output.split(), ['(7*100+5*10+4)', '754'])
+        self.assertListEqual(package_files(), files)
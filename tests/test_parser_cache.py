@@ -0,0 +1,74 @@
+"""
+Unit test for caching the compiled parsers.
+"""
+
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from historic_hebrew_dates import create_parsers, load_parsers
+from historic_hebrew_dates.parser_cache import CACHE_VARIABLE, cache_key
+
+
+class TestParserCache(unittest.TestCase):
+    """
+    Unit test class.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.environ = patch.dict(
+            os.environ, {CACHE_VARIABLE: self.directory.name})
+        self.environ.start()
+
+    def tearDown(self):
+        self.environ.stop()
+        self.directory.cleanup()
+
+    def test_load(self):
+        text = 'שנת ארבע מאות ועשרים לחרבן הבית'
+        expected = create_parsers('hebrew')['dates'].search(text)
+
+        created = load_parsers('hebrew')
+        self.assertEqual(len(os.listdir(self.directory.name)), 1)
+        self.assertListEqual(created['dates'].search(text), expected)
+
+        with patch('historic_hebrew_dates.parser_cache.create_parsers') as create:
+            loaded = load_parsers('hebrew')
+            create.assert_not_called()
+        self.assertListEqual(loaded['dates'].search(text), expected)
+
+    def test_remove_stale(self):
+        # created from other (older) sources
+        for filename in ['dutch-0123abcd-4567ef.pickle', 'dutch-89abcdef.pickle']:
+            with open(os.path.join(self.directory.name, filename), 'wb'):
+                pass
+        load_parsers('dutch')
+        load_parsers('english')
+        load_parsers('dutch', {'numerals': [['digit', 'een', '1']]})
+        load_parsers('dutch', compiled=False)
+        # the variants created from the current sources are kept
+        self.assertCountEqual(
+            os.listdir(self.directory.name),
+            [f'dutch-{cache_key("dutch")}.pickle',
+             f'dutch-{cache_key("dutch", {"numerals": [["digit", "een", "1"]]})}.pickle',
+             f'dutch-{cache_key("dutch", compiled=False)}.pickle',
+             f'english-{cache_key("english")}.pickle'])
+
+    def test_key(self):
+        key = cache_key('hebrew')
+        self.assertEqual(cache_key('hebrew'), key)
+        self.assertNotEqual(cache_key('hebrew', compiled=False), key)
+        self.assertNotEqual(cache_key('hebrew', {
+            'numerals': [['מספר', 'אחד', '1']]
+        }), key)
+        self.assertNotEqual(cache_key('dutch'), key)
+        # the variants share the digest of their sources
+        self.assertEqual(cache_key('hebrew', compiled=False).split('-')[0],
+                         key.split('-')[0])
+
+    def test_disabled(self):
+        with patch.dict(os.environ, {CACHE_VARIABLE: ''}):
+            load_parsers('dutch')
+        self.assertListEqual(os.listdir(self.directory.name), [])
@@ -0,0 +1,79 @@
+"""
+Unit test for changing the patterns of a parser.
+"""
+
+import csv
+import os
+import pickle
+import unittest
+
+from historic_hebrew_dates import create_parsers
+
+
+def read_rows(lang, name):
+    with open(os.path.join(os.path.dirname(os.path.dirname(__file__)), 'historic_hebrew_dates', 'patterns', f'{lang}_{name}.csv'), encoding='utf-8-sig') as patterns:
+        rows = csv.reader(patterns)
+        next(rows)  # skip header
+        return list(rows)
+
+
+class TestPatternParser(unittest.TestCase):
+    """
+    Unit test class.
+    """
+
+    def assertSameParsers(self, parsers, expected, texts):
+        for name, parser in parsers.items():
+            self.assertEqual(parser.dictionary(), expected[name].dictionary())
+            self.assertEqual(parser.tokenizer.dictionary,
+                             expected[name].tokenizer.dictionary)
+            for text in texts:
+                self.assertListEqual(
+                    parser.search(text), expected[name].search(text), f'{name}: {text}')
+
+    def test_edit_rows(self):
+        rows = read_rows('dutch', 'numerals')
+        texts = ['drie juli negentienhonderd', 'zevenentwintig maart',
+                 'elfhonderd', 'twaalf juni tweeduizend drie', 'iii juni']
+
+        parsers = create_parsers('dutch', {'numerals': rows[:10]})
+        parsers['numerals'].add_rows(rows[10:])
+        self.assertSameParsers(parsers, create_parsers('dutch'), texts)
+
+        parsers['numerals'].remove_rows(rows[20:25])
+        self.assertSameParsers(parsers, create_parsers(
+            'dutch', {'numerals': rows[:20] + rows[25:]}), texts)
+
+        replacement = ['digit', 'iii', '3']
+        parsers['numerals'].replace_row(rows[3], replacement)
+        replaced = list(rows[:20] + rows[25:])
+        replaced[3] = replacement
+        self.assertSameParsers(parsers, create_parsers(
+            'dutch', {'numerals': replaced}), texts)
+
+        with self.assertRaises(ValueError):
+            parsers['numerals'].remove_rows([rows[22]])
+
+    def test_edit_invalid_rows(self):
+        rows = read_rows('dutch', 'numerals')
+        texts = ['drie juli negentienhonderd', 'iii juni']
+        parsers = create_parsers('dutch')
+        numerals = parsers['numerals']
+
+        with self.assertRaises(ValueError):
+            numerals.remove_rows([rows[0], ['x', 'y', 'z']])
+        with self.assertRaises(Exception):
+            numerals.add_rows([['digit', 'iii', '3'], ['nummer', '{', '1']])
+        self.assertListEqual(numerals.rows, rows)
+        self.assertEqual(len(numerals.row_matchers), len(rows))
+        self.assertSameParsers(parsers, create_parsers('dutch'), texts)
+
+        # the failed edits aren't applied by a later edit
+        numerals.add_rows([['digit', 'iii', '3']])
+        self.assertSameParsers(parsers, create_parsers(
+            'dutch', {'numerals': rows + [['digit', 'iii', '3']]}), texts)
+
+    def test_pickle(self):
+        parsers = pickle.loads(pickle.dumps(create_parsers('english')))
+        parsers['numerals'].add_rows([['number', 'umpteen', '99']])
+        self.assertIn('umpteen', parsers['dates'].dictionary())
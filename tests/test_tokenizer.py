@@ -0,0 +1,71 @@
+"""
+Unit test for tokenizing texts using a dictionary.
+"""
+
+import unittest
+
+from historic_hebrew_dates.tokenizer import Tokenizer
+
+
+class TestTokenizer(unittest.TestCase):
+    """
+    Unit test class.
+    """
+
+    def test_subdivide(self):
+        tokenizer = Tokenizer({'ו', 'ה', 'וה', 'שנה', 'הש', 'נה'})
+        self.assertCountEqual(
+            tokenizer.subdivide('והשנה'),
+            [['ו', 'ה', 'שנה'], ['וה', 'שנה'], ['ו', 'הש', 'נה']])
+        self.assertListEqual(list(tokenizer.subdivide('ושנים')), [])
+
+    def test_subdivide_case(self):
+        tokenizer = Tokenizer({'Twenty', 'one'})
+        self.assertListEqual(
+            list(tokenizer.subdivide('twentyONE')), [['Twenty', 'one']])
+
+    def test_max_interpretations(self):
+        tokenizer = Tokenizer({'a', 'aa'}, max_interpretations=10)
+        word = 'a' * 200
+        self.assertEqual(len(list(tokenizer.subdivide(word))), 10)
+        self.assertEqual(
+            len(list(Tokenizer({'a', 'aa'}).subdivide('a' * 10))), 89)
+
+    def test_expand(self):
+        tokenizer = Tokenizer({'שבע', 'שבעים', 'תשע', 'ארבע', 'Seven'})
+        self.assertCountEqual(tokenizer.expand('שב?'), ['שבע', 'שבעים'])
+        self.assertCountEqual(tokenizer.expand('?שע'), ['תשע'])
+        self.assertCountEqual(tokenizer.expand('?ב?'), ['שבע', 'שבעים', 'ארבע'])
+        self.assertCountEqual(tokenizer.expand('s.v.n'), ['seven'])
+        self.assertCountEqual(tokenizer.expand('?x?'), [])
+        self.assertCountEqual(tokenizer.expand('?'), ['שבע', 'שבעים', 'תשע', 'ארבע', 'seven'])
+
+    def test_offsets(self):
+        tokenizer = Tokenizer({'שבע', 'מאות'})
+        text = ' שבע\tמאות\n\nושבע '
+        tokens = list(tokenizer.tokenize(text, 10))
+        self.assertListEqual(
+            [(token.start, token.end) for token in tokens],
+            [(11, 14), (15, 19), (21, 25)])
+        for token in tokens:
+            self.assertEqual(text[token.start - 10:token.end - 10], token.text)
+
+    def test_contains_known(self):
+        tokenizer = Tokenizer({'Seven', 'a+b', 'twenty'})
+        self.assertTrue(tokenizer.contains_known('twentySEVEN'))
+        self.assertTrue(tokenizer.contains_known('1 a+b'))
+        self.assertTrue(tokenizer.contains_known('s?'))
+        self.assertFalse(tokenizer.contains_known('six ab'))
+        # a token only containing a key is still unknown
+        self.assertFalse(tokenizer.contains_known('sevens twentyish'))
+        tokenizer.update({'six'})
+        self.assertTrue(tokenizer.contains_known('six ab'))
+        self.assertFalse(tokenizer.contains_known('seven'))
+        self.assertFalse(list(tokenizer.tokenize('sixteen'))[0].known)
+
+        # single letter prefixes only make a word known if the
+        # remainder is known as well
+        tokenizer = Tokenizer({'ו', 'ה', 'שבע'})
+        self.assertFalse(tokenizer.contains_known('והלך הביתה'))
+        self.assertTrue(tokenizer.contains_known('והלך ושבע'))
+        self.assertTrue(tokenizer.contains_known('וה'))
@@ -0,0 +1,70 @@
+"""
+Unit test for evaluating the values of matches.
+"""
+
+import math
+import unittest
+
+from historic_hebrew_dates.values.dict import compile_dict, dict_value
+from historic_hebrew_dates.values.numeral import compile_numeral, numeral_value
+
+
+class TestValues(unittest.TestCase):
+    """
+    Unit test class.
+    """
+
+    def test_numeral_value(self):
+        for expression in ['7*100+5*10+4', '((7*100+5*10)+4)', '-3*-2', '2--5',
+                           '1/4', '1.5e2*2', '00', ' 3 ', '+4-(2)']:
+            self.assertEqual(numeral_value(expression), eval(expression), expression)
+
+        # only arithmetic is allowed
+        for expression in ['', '07', '2**3', '__import__("os")', '{}', '1 2', '(1', '5/0', 'nan']:
+            self.assertTrue(math.isnan(numeral_value(expression)), expression)
+
+        # nested too deeply to parse
+        for expression in ['(' * 5000 + '1' + ')' * 5000, '-' * 5000 + '1']:
+            self.assertTrue(math.isnan(numeral_value(expression)))
+
+    def test_compile_numeral(self):
+        template = compile_numeral('({a}*10+{b})')
+        self.assertEqual(template.evaluate({'a': 4, 'b': 2}).value, 42)
+        self.assertTrue(math.isnan(template.evaluate({'a': math.nan, 'b': 2}).value))
+
+        # constant parts are folded
+        self.assertEqual(compile_numeral('(3*10+2)').tree.value, 32)
+
+        # results can be bound to other templates
+        product = compile_numeral('{a}*100').evaluate({'a': 7})
+        self.assertEqual(compile_numeral('{x}*1000').evaluate({'x': product}).value, 700000)
+        # these would have to be parenthesized when filled in
+        with self.assertRaises(ValueError):
+            compile_numeral('2*{x}').evaluate({'x': product})
+        with self.assertRaises(ValueError):
+            compile_numeral('{x}*2').evaluate(
+                {'x': compile_numeral('{a}+1').evaluate({'a': 1})})
+        with self.assertRaises(ValueError):
+            compile_numeral('{x}').evaluate({})
+
+        # concatenation is only possible by filling in the template
+        self.assertIsNone(compile_numeral('{a}{b}'))
+        self.assertIsNone(compile_numeral('(' * 5000 + '{a}' + ')' * 5000))
+
+    def test_compile_dict(self):
+        template = compile_dict("[type: '{type}', year: {year}, era: 'AD']")
+        bindings = {'type': 'destruction', 'year': 420}
+        self.assertEqual(template.evaluate(bindings), dict_value(
+            "[type: 'destruction', year: 420, era: 'AD']"))
+
+        # the bound values stay typed
+        self.assertEqual(template.evaluate({'type': 3, 'year': 1.5}),
+                         {'type': '3', 'year': 1.5, 'era': 'AD'})
+        self.assertTrue(math.isnan(template.evaluate(
+            {'type': 'x', 'year': math.nan})['year']))
+
+        with self.assertRaises(ValueError):
+            template.evaluate({'type': 'x'})
+
+        # only complete values can be slots
+        self.assertIsNone(compile_dict('[year: {century}00]'))